@@ -0,0 +1,229 @@
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+
+# Sales figures for staffing decisions, computed over the live orders/order_items tables.
+# Results are kept in a small LRU cache. Today's entries expire after `ttl` seconds
+# (other registers may be checking out into the same file); entries for past days
+# never expire. A checkout through the POSDatabase this was built on drops only
+# the cached entries for that order's day, so a dashboard polling every few
+# seconds re-runs a query only after something actually changed.
+# Days are UTC dates, the same as order_date and the end-of-day export.
+# Days moved to the columnar archive (archive.py) are read from there as well, so
+# comparisons with last week keep working after the nightly archive job.
+
+
+class SalesAnalytics:
+
+    def __init__(self, database, ttl: float = 30.0, maxsize: int = 128, archive_dir: str = "archive"):
+
+        self.db = database
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.archive_dir = archive_dir
+
+        # (query name, day, args) -> (expires_at or None, result), least recently used first
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        database.checkout_listeners.append(self.on_checkout)
+
+    # cache
+
+    def _cached(self, name: str, day: str, args: tuple, compute):
+        key = (name, day, args)
+        entry = self._cache.get(key)
+        if entry is not None:
+            expires_at, result = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return result
+            del self._cache[key]
+
+        self.misses += 1
+        result = compute()
+        today = self._today()
+        expires_at = time.monotonic() + self.ttl if day >= today else None
+        self._cache[key] = (expires_at, result)
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+        return result
+
+    def invalidate_day(self, day: str):
+        for key in [key for key in self._cache if key[1] == day]:
+            del self._cache[key]
+
+    def clear(self):
+        self._cache.clear()
+
+    def on_checkout(self, order_id: int, day: str):
+        self.invalidate_day(day)
+
+    def _today(self) -> str:
+        return datetime.now(timezone.utc).date().isoformat()
+
+    # archive
+
+    def _is_archived(self, day: str) -> bool:
+        import archive
+        return archive.has_day(day, self.archive_dir)
+
+    def _day_orders(self, day: str) -> dict:
+        #order_id -> (unix timestamp, total) for every paid order of an archived day,
+        #archive and live tables merged (an order in both is counted once)
+        import archive
+        orders = {order_id: (timestamp, cents / 100)
+                  for order_id, (timestamp, cents) in archive.order_totals(day, self.archive_dir).items()}
+        self.db.cursor.execute("""
+            SELECT order_id, CAST(strftime('%s', order_date) AS INTEGER), total_amount
+            FROM orders
+            WHERE order_date >= ? AND order_date < date(?, '+1 day')
+            AND status = 'completed'
+        """, (day, day))
+        for order_id, timestamp, total in self.db.cursor.fetchall():
+            orders[order_id] = (timestamp, total)
+        return orders
+
+    # queries
+
+    def sales_by_bucket(self, day: str | None = None, minutes: int = 15) -> list:
+        #[(bucket start "HH:MM", orders, revenue)] for every bucket that had sales
+        day = day or self._today()
+
+        def compute():
+            if self._is_archived(day):
+                buckets = {}
+                for timestamp, total in self._day_orders(day).values():
+                    at = datetime.fromtimestamp(timestamp, timezone.utc)
+                    bucket = (at.hour * 60 + at.minute) // minutes
+                    count, revenue = buckets.get(bucket, (0, 0.0))
+                    buckets[bucket] = (count + 1, revenue + total)
+                rows = [(bucket, count, revenue) for bucket, (count, revenue) in sorted(buckets.items())]
+            else:
+                self.db.cursor.execute("""
+                    SELECT
+                        (CAST(strftime('%H', order_date) AS INTEGER) * 60
+                         + CAST(strftime('%M', order_date) AS INTEGER)) / ? AS bucket,
+                        COUNT(*),
+                        SUM(total_amount)
+                    FROM orders
+                    WHERE order_date >= ? AND order_date < date(?, '+1 day')
+                    AND status = 'completed'
+                    GROUP BY bucket
+                    ORDER BY bucket
+                """, (minutes, day, day))
+                rows = self.db.cursor.fetchall()
+            return [(f"{bucket * minutes // 60:02d}:{bucket * minutes % 60:02d}", count, round(revenue, 2))
+                    for bucket, count, revenue in rows]
+
+        return self._cached("sales_by_bucket", day, (minutes,), compute)
+
+    def top_items(self, day: str | None = None, limit: int = 10) -> list:
+        #[(item_id, name, quantity, revenue)] best sellers by quantity
+        day = day or self._today()
+
+        def compute():
+            archived = self._is_archived(day)
+            self.db.cursor.execute("""
+                SELECT oi.item_id, i.name, SUM(oi.quantity) AS qty,
+                       SUM(oi.quantity * oi.price_at_order)
+                FROM orders o
+                JOIN order_items oi ON o.order_id = oi.order_id
+                LEFT JOIN items i ON oi.item_id = i.item_id
+                WHERE o.order_date >= ? AND o.order_date < date(?, '+1 day')
+                AND o.status = 'completed'
+                GROUP BY oi.item_id
+                ORDER BY qty DESC
+                LIMIT ?
+            """, (day, day, -1 if archived else limit))
+            rows = self.db.cursor.fetchall()
+
+            if archived:
+                import archive
+                self.db.cursor.execute("""
+                    SELECT order_id FROM orders
+                    WHERE order_date >= ? AND order_date < date(?, '+1 day')
+                    AND status = 'completed'
+                """, (day, day))
+                live_orders = {row[0] for row in self.db.cursor.fetchall()}
+                sales = {item_id: [name, qty, revenue] for item_id, name, qty, revenue in rows}
+                for item_id, (qty, cents) in archive.item_sales(day, self.archive_dir, live_orders).items():
+                    entry = sales.setdefault(item_id, [None, 0, 0.0])
+                    entry[1] += qty
+                    entry[2] += cents / 100
+                self.db.cursor.execute("SELECT item_id, name FROM items")
+                names = dict(self.db.cursor.fetchall())
+                rows = sorted(((item_id, name or names.get(item_id), qty, revenue)
+                               for item_id, (name, qty, revenue) in sales.items()),
+                              key=lambda row: row[2], reverse=True)[:limit]
+
+            return [(item_id, name, qty, round(revenue, 2)) for item_id, name, qty, revenue in rows]
+
+        return self._cached("top_items", day, (limit,), compute)
+
+    def day_totals(self, day: str | None = None) -> dict:
+        #Orders, revenue and average ticket for one day
+        day = day or self._today()
+
+        def compute():
+            if self._is_archived(day):
+                totals = [total for _, total in self._day_orders(day).values()]
+                count, revenue = len(totals), sum(totals)
+            else:
+                self.db.cursor.execute("""
+                    SELECT COUNT(*), COALESCE(SUM(total_amount), 0)
+                    FROM orders
+                    WHERE order_date >= ? AND order_date < date(?, '+1 day')
+                    AND status = 'completed'
+                """, (day, day))
+                count, revenue = self.db.cursor.fetchone()
+            return {
+                'day': day,
+                'orders': count,
+                'revenue': round(revenue, 2),
+                'average': round(revenue / count, 2) if count else 0.0
+            }
+
+        return self._cached("day_totals", day, (), compute)
+
+    def same_day_last_week(self, day: str | None = None) -> dict:
+        #This day's totals next to the same weekday one week earlier
+        day = day or self._today()
+        last_week = (date.fromisoformat(day) - timedelta(days=7)).isoformat()
+        current = self.day_totals(day)
+        previous = self.day_totals(last_week)
+
+        change = None
+        if previous['revenue']:
+            change = round((current['revenue'] - previous['revenue']) / previous['revenue'] * 100, 1)
+        return {'day': current, 'last_week': previous, 'revenue_change_pct': change}
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import POSDatabase
+
+    parser = argparse.ArgumentParser(description="Sales figures for one day")
+    parser.add_argument("--db", default="restaurant.db")
+    parser.add_argument("--day", help="YYYY-MM-DD (default: today, UTC)")
+    parser.add_argument("--minutes", type=int, default=15, help="bucket size")
+    parser.add_argument("--archive-dir", default="archive")
+    args = parser.parse_args()
+
+    db = POSDatabase(args.db)
+    analytics = SalesAnalytics(db, archive_dir=args.archive_dir)
+    try:
+        print(f"Sales per {args.minutes} minutes:")
+        for bucket, count, revenue in analytics.sales_by_bucket(args.day, args.minutes):
+            print(f"  {bucket}  {count:4d} orders  ${revenue:9.2f}")
+        print("Top items:")
+        for item_id, name, qty, revenue in analytics.top_items(args.day):
+            print(f"  {item_id:5d} {name or '?':<24} {qty:5d}  ${revenue:9.2f}")
+        comparison = analytics.same_day_last_week(args.day)
+        change = comparison['revenue_change_pct']
+        print(f"Revenue ${comparison['day']['revenue']:.2f} vs ${comparison['last_week']['revenue']:.2f} "
+              f"same day last week ({'n/a' if change is None else f'{change:+}%'})")
+    finally:
+        db.close()
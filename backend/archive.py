@@ -0,0 +1,239 @@
+import os
+import sqlite3
+from datetime import date
+
+# Columnar archive for closed business days.
+# Each day's completed orders are moved out of the live orders/order_items tables
+# into archive/orders_<YYYY-MM-DD>.npy: one fixed-width row per order line.
+# Files are read back with numpy's mmap_mode so analytics never copy the data.
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed for archiving, the register runs without it
+    np = None
+
+ARCHIVE_DIR = "archive"
+
+# order_total_cents and customer_name are kept so archived days still produce the full EOD CSV
+ROW_FIELDS = [
+    ("order_id", "<i8"),
+    ("timestamp", "<i8"),          # unix seconds (order_date is stored in UTC)
+    ("item_id", "<i8"),
+    ("qty", "<i4"),
+    ("price_cents", "<i8"),
+    ("order_total_cents", "<i8"),
+    ("customer_name", "S40"),      # utf-8, truncated to 40 bytes
+]
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError("numpy is required for the order archive (pip install numpy)")
+
+
+def archive_path(day: str, archive_dir: str = ARCHIVE_DIR) -> str:
+    return os.path.join(archive_dir, f"orders_{day}.npy")
+
+
+def has_day(day: str, archive_dir: str = ARCHIVE_DIR) -> bool:
+    return os.path.exists(archive_path(day, archive_dir))
+
+
+def load_day(day: str, archive_dir: str = ARCHIVE_DIR):
+    #Returns the archived rows for a day as a read-only memmap (empty array if not archived)
+    _require_numpy()
+    path = archive_path(day, archive_dir)
+    if not os.path.exists(path):
+        return np.zeros(0, dtype=ROW_FIELDS)
+    return np.load(path, mmap_mode="r")
+
+
+def archived_item_ids(archive_dir: str = ARCHIVE_DIR) -> set:
+    #Every item_id used by any archived day (their names are still read from items)
+    if not os.path.isdir(archive_dir):
+        return set()
+    files = [name for name in os.listdir(archive_dir) if name.startswith("orders_") and name.endswith(".npy")]
+    if not files:
+        return set()
+    _require_numpy()
+    item_ids = set()
+    for name in files:
+        data = np.load(os.path.join(archive_dir, name), mmap_mode="r")
+        item_ids.update(int(i) for i in np.unique(data["item_id"]))
+    return item_ids
+
+
+def closed_days(conn: sqlite3.Connection, before: str) -> list:
+    #Days with completed orders strictly before the given date
+    rows = conn.execute("""
+        SELECT DISTINCT date(order_date)
+        FROM orders
+        WHERE status = 'completed' AND date(order_date) < date(?)
+        ORDER BY 1
+    """, (before,)).fetchall()
+    return [row[0] for row in rows]
+
+
+def archive_day(conn: sqlite3.Connection, day: str, archive_dir: str = ARCHIVE_DIR) -> int:
+    #Moves one day's completed orders into its archive file, returns the number of lines archived
+    _require_numpy()
+    rows = conn.execute("""
+        SELECT
+            o.order_id,
+            CAST(strftime('%s', o.order_date) AS INTEGER),
+            oi.item_id,
+            oi.quantity,
+            CAST(ROUND(oi.price_at_order * 100) AS INTEGER),
+            CAST(ROUND(o.total_amount * 100) AS INTEGER),
+            COALESCE(o.customer_name, '')
+        FROM orders o
+        JOIN order_items oi ON o.order_id = oi.order_id
+        WHERE date(o.order_date) = date(?) AND o.status = 'completed'
+        ORDER BY o.order_id, oi.id
+    """, (day,)).fetchall()
+    if not rows:
+        return 0
+
+    new = np.array(
+        [r[:6] + (r[6].encode("utf-8")[:40],) for r in rows],
+        dtype=ROW_FIELDS,
+    )
+
+    # Late orders for an already archived day are appended to its file. Orders already
+    # in it (a previous run that stopped before its DELETE) are replaced, not duplicated.
+    path = archive_path(day, archive_dir)
+    if os.path.exists(path):
+        existing = np.load(path)
+        existing = existing[~np.isin(existing["order_id"], new["order_id"])]
+        new = np.concatenate([existing, new])
+        new = new[np.argsort(new["order_id"], kind="stable")]
+
+    # Write to a temp file first so a crash never leaves a half-written archive
+    os.makedirs(archive_dir, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, new)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+    # Only remove the live rows once the archive is safely on disk, and only the
+    # orders that were archived (a tab from that day may have been paid meanwhile)
+    order_ids = sorted({r[0] for r in rows})
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        has_change_log = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'order_changes'").fetchone() is not None
+        if has_change_log:
+            last_change = conn.execute("SELECT COALESCE(MAX(change_id), 0) FROM order_changes").fetchone()[0]
+        conn.executemany("DELETE FROM orders WHERE order_id = ?", [(order_id,) for order_id in order_ids])
+        if has_change_log:
+            # Archiving is not a deletion as far as incremental syncs are concerned
+            # (run the sync before archiving so no unsent orders are moved). The write
+            # lock is held, so every change row after last_change is from this DELETE.
+            conn.execute("DELETE FROM order_changes WHERE change_id > ?", (last_change,))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    return len(rows)
+
+
+def archive_closed_days(conn: sqlite3.Connection, before: str | None = None,
+                        archive_dir: str = ARCHIVE_DIR) -> dict:
+    #Archives every closed day (default: everything before today)
+    if before is None:
+        before = date.today().isoformat()
+    archived = {}
+    for day in closed_days(conn, before):
+        archived[day] = archive_day(conn, day, archive_dir)
+    return archived
+
+
+def day_report_rows(day: str, item_names: dict, archive_dir: str = ARCHIVE_DIR,
+                    exclude_orders=None) -> list:
+    #Archived lines in the same column layout as POSDatabase.export_end_of_day_csv
+    #(exclude_orders as in item_sales)
+    data = load_day(day, archive_dir)
+    if exclude_orders:
+        data = data[~np.isin(data["order_id"], list(exclude_orders))]
+    rows = []
+    for r in data:
+        qty = int(r["qty"])
+        price = int(r["price_cents"]) / 100
+        rows.append((
+            int(r["order_id"]),
+            day,
+            r["customer_name"].decode("utf-8", errors="replace"),
+            int(r["item_id"]),
+            item_names.get(int(r["item_id"])),
+            qty,
+            price,
+            round(qty * price, 2),
+            int(r["order_total_cents"]) / 100,
+        ))
+    return rows
+
+
+def order_totals(day: str, archive_dir: str = ARCHIVE_DIR) -> dict:
+    #order_id -> (unix timestamp, order total in cents), one entry per archived order
+    data = load_day(day, archive_dir)
+    order_ids, first = np.unique(data["order_id"], return_index=True)
+    return {int(order_id): (int(data["timestamp"][i]), int(data["order_total_cents"][i]))
+            for order_id, i in zip(order_ids, first)}
+
+
+def item_sales(day: str, archive_dir: str = ARCHIVE_DIR, exclude_orders=None) -> dict:
+    #item_id -> (quantity sold, revenue in cents) computed straight off the memmap.
+    #exclude_orders: order IDs to leave out, e.g. ones that are also still in the live tables
+    data = load_day(day, archive_dir)
+    if exclude_orders:
+        data = data[~np.isin(data["order_id"], list(exclude_orders))]
+    if len(data) == 0:
+        return {}
+    item_ids, inverse = np.unique(data["item_id"], return_inverse=True)
+    qty = np.bincount(inverse, weights=data["qty"])
+    revenue = np.bincount(inverse, weights=data["qty"] * data["price_cents"])
+    return {int(i): (int(q), int(c)) for i, q, c in zip(item_ids, qty, revenue)}
+
+
+def item_order_counts(day: str, archive_dir: str = ARCHIVE_DIR, exclude_orders=None) -> dict:
+    #item_id -> number of archived orders containing it (exclude_orders as in item_sales)
+    data = load_day(day, archive_dir)
+    if exclude_orders:
+        data = data[~np.isin(data["order_id"], list(exclude_orders))]
+    if len(data) == 0:
+        return {}
+    pairs = np.unique(np.stack([data["item_id"], data["order_id"]], axis=1), axis=0)
+    item_ids, counts = np.unique(pairs[:, 0], return_counts=True)
+    return {int(i): int(n) for i, n in zip(item_ids, counts)}
+
+
+def archived_days(archive_dir: str = ARCHIVE_DIR) -> list:
+    #Days that have an archive file, oldest first
+    if not os.path.isdir(archive_dir):
+        return []
+    return sorted(name[len("orders_"):-len(".npy")] for name in os.listdir(archive_dir)
+                  if name.startswith("orders_") and name.endswith(".npy"))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Move closed business days into the columnar archive")
+    parser.add_argument("--db", default="restaurant.db")
+    parser.add_argument("--before", help="archive days before this date (default: today)")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    conn.execute("PRAGMA foreign_keys = ON")   # order_items are removed via ON DELETE CASCADE
+    try:
+        archived = archive_closed_days(conn, args.before, args.archive_dir)
+    finally:
+        conn.close()
+
+    if not archived:
+        print("Nothing to archive.")
+    for day, count in archived.items():
+        print(f"Archived {day}: {count} order lines")
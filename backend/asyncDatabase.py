@@ -0,0 +1,256 @@
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from database import POSDatabase
+from items import Item
+from order import Order
+
+
+class AsyncPOSDatabase:
+    # asyncio facade over POSDatabase for services that handle many terminals.
+    # sqlite3 connections belong to the thread that opened them, so:
+    #   - every write goes through one writer thread with its own POSDatabase; save_order
+    #     calls that arrive while it is busy are committed together (POSDatabase.save_orders)
+    #   - reads run on a small thread pool, each thread with its own read connection.
+    # The file is switched to WAL journaling so readers never wait for the writer.
+
+    def __init__(self, db_name: str = "restaurant.db", readers: int = 4, max_batch: int = 64):
+
+        self.db_name = db_name
+        self.max_batch = max_batch
+
+        # number of commits and orders saved, to see how well writes are batching
+        self.commits = 0
+        self.orders_saved = 0
+
+        self._writes = queue.Queue()
+        self._writer_ready = threading.Event()
+        self._writer_error = None
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+        self._writer_ready.wait()
+        if self._writer_error is not None:
+            raise self._writer_error
+
+        self._local = threading.local()
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="pos-reader")
+
+    # writer thread
+
+    def _write_loop(self):
+        try:
+            db = POSDatabase(self.db_name)
+            db.cursor.execute("PRAGMA journal_mode=WAL")
+            db.cursor.execute("PRAGMA synchronous=NORMAL")
+        except Exception as e:
+            self._writer_error = e
+            return
+        finally:
+            self._writer_ready.set()
+
+        while True:
+            job = self._writes.get()
+            if job is None:
+                break
+            jobs = [job]
+            # Take whatever else is already waiting so it shares one commit
+            while len(jobs) < self.max_batch:
+                try:
+                    job = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    self._writes.put(None)
+                    break
+                jobs.append(job)
+            self._run_writes(db, jobs)
+
+        db.close()
+
+    def _run_writes(self, db: POSDatabase, jobs: list):
+        # Consecutive save_order jobs are group committed, anything else runs as is
+        pending_saves = []
+        for job in jobs:
+            name, args, loop, future = job
+            if name == "save_order":
+                pending_saves.append(job)
+                continue
+            self._flush_saves(db, pending_saves)
+            pending_saves = []
+            try:
+                result = getattr(db, name)(*args)
+                self.commits += 1
+                self._resolve(loop, future, result)
+            except Exception as e:
+                self._resolve(loop, future, exception=e)
+        self._flush_saves(db, pending_saves)
+
+    def _flush_saves(self, db: POSDatabase, jobs: list):
+        if not jobs:
+            return
+        try:
+            order_ids = db.save_orders([args for _, args, _, _ in jobs])
+        except Exception as e:
+            # save_orders handles bad orders and listener errors itself, so this is the
+            # batch as a whole failing; every caller hears about it and the writer keeps going
+            for _, _, loop, future in jobs:
+                self._resolve(loop, future, exception=e)
+            return
+        self.commits += 1
+        self.orders_saved += sum(1 for order_id in order_ids if order_id is not None)
+        for (_, _, loop, future), order_id in zip(jobs, order_ids):
+            self._resolve(loop, future, order_id)
+
+    @staticmethod
+    def _resolve(loop, future, result=None, exception=None):
+        def settle():
+            if future.done():
+                return
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        try:
+            loop.call_soon_threadsafe(settle)
+        except RuntimeError:
+            pass   # the caller's event loop is gone, nobody is waiting any more
+
+    def _write(self, name: str, *args):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._writes.put((name, args, loop, future))
+        return future
+
+    # reader threads
+
+    def _reader_db(self) -> POSDatabase:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = POSDatabase(self.db_name)
+            # stock flags change on the writer; let SQL decide availability here
+            db.out_of_stock = set()
+            self._local.db = db
+        return db
+
+    def _read(self, name: str, *args):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._readers, lambda: getattr(self._reader_db(), name)(*args))
+
+    # the POSDatabase operations
+
+    async def get_item(self, item_id: int) -> Optional[Item]:
+        return await self._read("get_item", item_id)
+
+    async def get_all_items(self) -> List[Item]:
+        return await self._read("get_all_items")
+
+    async def get_all_orders(self, limit: int = 100) -> List[dict]:
+        return await self._read("get_all_orders", limit)
+
+    async def get_open_orders(self, terminal_id: str | None = None) -> List[dict]:
+        return await self._read("get_open_orders", terminal_id)
+
+    async def export_end_of_day_csv(self, report_date: str | None = None, out_dir: str = "reports",
+                                    archive_dir: str = "archive") -> str | None:
+        return await self._read("export_end_of_day_csv", report_date, out_dir, archive_dir)
+
+    async def save_order(self, order: Order, total_amount: float) -> Optional[int]:
+        return await self._write("save_order", order, total_amount)
+
+    async def add_item(self, item: Item) -> bool:
+        return await self._write("add_item", item)
+
+    async def update_item(self, item: Item) -> bool:
+        return await self._write("update_item", item)
+
+    async def delete_item(self, item_id: int) -> bool:
+        return await self._write("delete_item", item_id)
+
+    async def open_order(self, customer_name: str = "", terminal_id: str | None = None,
+                         order_id: int | None = None) -> Optional[int]:
+        return await self._write("open_order", customer_name, terminal_id, order_id)
+
+    async def add_order_line(self, order_id: int, item: Item, quantity: int) -> bool:
+        return await self._write("add_order_line", order_id, item, quantity)
+
+    async def remove_order_line(self, order_id: int, item_id: int) -> bool:
+        return await self._write("remove_order_line", order_id, item_id)
+
+    async def pay_order(self, order_id: int, total_amount: float) -> bool:
+        return await self._write("pay_order", order_id, total_amount)
+
+    async def void_order(self, order_id: int) -> bool:
+        return await self._write("void_order", order_id)
+
+    async def export_changes(self, out_path: str, consumer: str = "default", fmt: str = "ndjson") -> int:
+        # advances the watermark, so it runs on the writer
+        return await self._write("export_changes", out_path, consumer, fmt)
+
+    async def close(self):
+        self._writes.put(None)
+        await asyncio.get_running_loop().run_in_executor(None, self._writer.join)
+        # reader connections are closed as their threads exit and drop the thread-locals
+        self._readers.shutdown(wait=True)
+
+
+async def _bench_async(db_name: str, orders: list) -> float:
+    import time
+
+    db = AsyncPOSDatabase(db_name)
+    started = time.perf_counter()
+    await asyncio.gather(*(db.save_order(order, total) for order, total in orders))
+    elapsed = time.perf_counter() - started
+    print(f"  async: {len(orders) / elapsed:8.0f} checkouts/s "
+          f"({db.orders_saved} orders in {db.commits} commits)")
+    await db.close()
+    return elapsed
+
+
+def _bench_sync(db_name: str, orders: list) -> float:
+    import io
+    import time
+    import contextlib
+
+    db = POSDatabase(db_name)
+    # same journaling as the async writer, so only the batching differs
+    db.cursor.execute("PRAGMA journal_mode=WAL")
+    db.cursor.execute("PRAGMA synchronous=NORMAL")
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # save_order prints every order
+        for order, total in orders:
+            db.save_order(order, total)
+    elapsed = time.perf_counter() - started
+    print(f"  sync:  {len(orders) / elapsed:8.0f} checkouts/s (one commit per order)")
+    db.close()
+    return elapsed
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Benchmark concurrent checkouts: AsyncPOSDatabase vs POSDatabase")
+    parser.add_argument("--orders", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_name = os.path.join(tmp, "bench.db")
+        setup = POSDatabase(db_name)
+        menu = [Item(i, f"Item {i}", "", 1.0 + i) for i in range(1, 11)]
+        for item in menu:
+            setup.add_item(item)
+        setup.close()
+
+        orders = []
+        for n in range(args.orders):
+            order = Order(0, f"Customer {n}")
+            order.add_item(menu[n % len(menu)], 1 + n % 3)
+            order.add_item(menu[(n * 7) % len(menu)], 1)
+            orders.append((order, 10.0))
+
+        print(f"{args.orders} checkouts:")
+        _bench_sync(db_name, orders)
+        asyncio.run(_bench_async(db_name, orders))
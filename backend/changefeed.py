@@ -0,0 +1,137 @@
+import os
+import csv
+import json
+import sqlite3
+
+# Incremental export of orders since a watermark.
+# Triggers created by POSDatabase.create_tables append to order_changes whenever an
+# order or its lines are inserted, edited or deleted. Each consumer's watermark
+# (the last change_id it received) lives in sync_state, so a run only reads the
+# changes made since the previous one and streams them out in batches.
+
+BATCH_SIZE = 500
+
+CSV_COLUMNS = ["change_id", "op", "order_id", "customer_name", "order_date", "total_amount",
+               "status", "item_id", "quantity", "price_at_order"]
+
+
+def get_watermark(conn: sqlite3.Connection, consumer: str) -> int:
+    row = conn.execute("SELECT last_change_id FROM sync_state WHERE consumer = ?", (consumer,)).fetchone()
+    return row[0] if row else 0
+
+
+def set_watermark(conn: sqlite3.Connection, consumer: str, change_id: int):
+    conn.execute("""
+        INSERT INTO sync_state (consumer, last_change_id) VALUES (?, ?)
+        ON CONFLICT(consumer) DO UPDATE SET last_change_id = excluded.last_change_id
+    """, (consumer, change_id))
+    conn.commit()
+
+
+def iter_changes(conn: sqlite3.Connection, since: int, until: int):
+    #Yields one record per changed order (latest state only), in change order
+    cursor = conn.execute("""
+        SELECT MAX(c.change_id), c.order_id, o.customer_name, o.order_date, o.total_amount, o.status
+        FROM order_changes c
+        LEFT JOIN orders o ON o.order_id = c.order_id
+        WHERE c.change_id > ? AND c.change_id <= ?
+        GROUP BY c.order_id
+        ORDER BY MAX(c.change_id)
+    """, (since, until))
+
+    while True:
+        batch = cursor.fetchmany(BATCH_SIZE)
+        if not batch:
+            break
+
+        # One query for all the lines in this batch instead of one per order
+        order_ids = [row[1] for row in batch]
+        placeholders = ",".join("?" * len(order_ids))
+        lines = {}
+        for order_id, item_id, quantity, price in conn.execute(f"""
+            SELECT order_id, item_id, quantity, price_at_order
+            FROM order_items
+            WHERE order_id IN ({placeholders})
+            ORDER BY id
+        """, order_ids):
+            lines.setdefault(order_id, []).append(
+                {"item_id": item_id, "quantity": quantity, "price_at_order": price})
+
+        for change_id, order_id, customer_name, order_date, total_amount, status in batch:
+            if order_date is None:
+                yield {"change_id": change_id, "op": "delete", "order_id": order_id}
+                continue
+            yield {
+                "change_id": change_id,
+                "op": "upsert",
+                "order_id": order_id,
+                "customer_name": customer_name,
+                "order_date": order_date,
+                "total_amount": total_amount,
+                "status": status,
+                "items": lines.get(order_id, []),
+            }
+
+
+def _write_ndjson(f, records) -> int:
+    count = 0
+    for record in records:
+        f.write(json.dumps(record) + "\n")
+        count += 1
+    return count
+
+
+def _write_csv(f, records) -> int:
+    writer = csv.writer(f)
+    writer.writerow(CSV_COLUMNS)
+    count = 0
+    for record in records:
+        head = [record["change_id"], record["op"], record["order_id"], record.get("customer_name"),
+                record.get("order_date"), record.get("total_amount"), record.get("status")]
+        items = record.get("items")
+        if not items:
+            writer.writerow(head + [None, None, None])
+        for line in items or []:
+            writer.writerow(head + [line["item_id"], line["quantity"], line["price_at_order"]])
+        count += 1
+    return count
+
+
+def export_changes(conn: sqlite3.Connection, out_path: str, consumer: str = "default",
+                   fmt: str = "ndjson") -> int:
+    #Streams every order changed since the consumer's watermark to out_path and
+    #advances the watermark once the file is complete. Returns the number of orders written.
+    if fmt not in ("ndjson", "csv"):
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    since = get_watermark(conn, consumer)
+    until = conn.execute("SELECT COALESCE(MAX(change_id), 0) FROM order_changes").fetchone()[0]
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        records = iter_changes(conn, since, until)
+        count = _write_ndjson(f, records) if fmt == "ndjson" else _write_csv(f, records)
+    os.replace(tmp_path, out_path)
+
+    set_watermark(conn, consumer, until)
+    return count
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import POSDatabase
+
+    parser = argparse.ArgumentParser(description="Export orders changed since the last sync")
+    parser.add_argument("out", help="output file")
+    parser.add_argument("--db", default="restaurant.db")
+    parser.add_argument("--consumer", default="default", help="name of the sync that owns the watermark")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    args = parser.parse_args()
+
+    db = POSDatabase(args.db)
+    try:
+        count = db.export_changes(args.out, args.consumer, args.format)
+    finally:
+        db.close()
+    print(f"Exported {count} changed orders to {args.out}")
@@ -0,0 +1,164 @@
+import os
+import csv
+import sqlite3
+import fnmatch
+from concurrent.futures import ProcessPoolExecutor
+
+# Head-office consolidation of many store databases.
+# Each worker process opens one store's restaurant.db read-only and aggregates it
+# in SQL, so only the small per-store/day/item totals travel back to the parent.
+# Days the store has moved to its columnar archive (archive/ next to the database,
+# see archive.py) are added from there, so archiving doesn't hide them from head office.
+
+CONSOLIDATED_COLUMNS = ["store", "order_date", "item_id", "item_name", "quantity", "revenue", "orders"]
+
+
+def store_name(db_path: str) -> str:
+    #stores/<store>/restaurant.db -> <store>, otherwise the file name without extension
+    base = os.path.splitext(os.path.basename(db_path))[0]
+    if base == "restaurant":
+        return os.path.basename(os.path.dirname(os.path.abspath(db_path)))
+    return base
+
+
+def aggregate_store(db_path: str, start_date: str | None = None, end_date: str | None = None,
+                    archive_name: str = "archive") -> dict:
+    #Worker: (store, day, item_id) -> [item_name, quantity, revenue, orders] for one database
+    #and its archive
+    store = store_name(db_path)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("""
+            SELECT
+                date(o.order_date) AS order_date,
+                oi.item_id,
+                i.name,
+                SUM(oi.quantity),
+                SUM(oi.quantity * oi.price_at_order),
+                COUNT(DISTINCT o.order_id)
+            FROM orders o
+            JOIN order_items oi ON o.order_id = oi.order_id
+            LEFT JOIN items i ON oi.item_id = i.item_id
+            WHERE o.status = 'completed'
+            AND (? IS NULL OR date(o.order_date) >= date(?))
+            AND (? IS NULL OR date(o.order_date) <= date(?))
+            GROUP BY date(o.order_date), oi.item_id
+        """, (start_date, start_date, end_date, end_date)).fetchall()
+        live = {(store, day, item_id): [name, qty, revenue, orders]
+                for day, item_id, name, qty, revenue, orders in rows}
+        archived = aggregate_archive(conn, store, os.path.join(os.path.dirname(db_path), archive_name),
+                                     start_date, end_date)
+    finally:
+        conn.close()
+
+    return merge_partials([live, archived])
+
+
+def aggregate_archive(conn: sqlite3.Connection, store: str, archive_dir: str,
+                      start_date: str | None = None, end_date: str | None = None) -> dict:
+    #Same shape as aggregate_store, from the store's archive files
+    import archive
+
+    days = [day for day in archive.archived_days(archive_dir)
+            if (start_date is None or day >= start_date) and (end_date is None or day <= end_date)]
+    if not days:
+        return {}
+
+    names = dict(conn.execute("SELECT item_id, name FROM items").fetchall())
+    totals = {}
+    for day in days:
+        # an order still in the live tables too (archive interrupted) is only counted there
+        live_orders = {row[0] for row in conn.execute("""
+            SELECT order_id FROM orders
+            WHERE date(order_date) = date(?) AND status = 'completed'
+        """, (day,))}
+        order_counts = archive.item_order_counts(day, archive_dir, live_orders)
+        for item_id, (qty, cents) in archive.item_sales(day, archive_dir, live_orders).items():
+            totals[(store, day, item_id)] = [names.get(item_id), qty, cents / 100, order_counts[item_id]]
+    return totals
+
+
+def merge_partials(partials) -> dict:
+    #Adds partial aggregates together (two files for the same store are summed)
+    merged = {}
+    for partial in partials:
+        for key, (name, qty, revenue, orders) in partial.items():
+            if key in merged:
+                total = merged[key]
+                total[1] += qty
+                total[2] += revenue
+                total[3] += orders
+            else:
+                merged[key] = [name, qty, revenue, orders]
+    return merged
+
+
+def consolidate(db_paths: list, start_date: str | None = None, end_date: str | None = None,
+                workers: int | None = None, archive_name: str = "archive") -> dict:
+    #Aggregates every store database in parallel, one task per database
+    if not db_paths:
+        return {}
+    workers = min(workers or os.cpu_count() or 1, len(db_paths))
+    partials = []
+    if workers == 1:
+        for path in db_paths:
+            try:
+                partials.append(aggregate_store(path, start_date, end_date, archive_name))
+            except sqlite3.Error as e:
+                print(f"Skipping {path}: {e}")
+        return merge_partials(partials)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(aggregate_store, p, start_date, end_date, archive_name) for p in db_paths]
+        for path, future in zip(db_paths, futures):
+            try:
+                partials.append(future.result())
+            except sqlite3.Error as e:
+                print(f"Skipping {path}: {e}")
+    return merge_partials(partials)
+
+
+def write_csv(merged: dict, filepath: str) -> str:
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    with open(filepath, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CONSOLIDATED_COLUMNS)
+        for (store, day, item_id), (name, qty, revenue, orders) in sorted(merged.items()):
+            writer.writerow([store, day, item_id, name, qty, round(revenue, 2), orders])
+    return filepath
+
+
+def find_databases(root: str, pattern: str = "restaurant.db") -> list:
+    #Every file under a directory whose name matches pattern. Only the live databases
+    #by default: reporting snapshots (restaurant_snapshot.db) would be counted twice
+    found = []
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            if fnmatch.fnmatch(filename, pattern):
+                found.append(os.path.join(dirpath, filename))
+    return sorted(found)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Consolidate sales from many store databases")
+    parser.add_argument("paths", nargs="+", help="database files or directories containing them")
+    parser.add_argument("--start", help="first day to include (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last day to include (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--out", default=os.path.join("reports", "consolidated.csv"))
+    parser.add_argument("--pattern", default="restaurant.db", help="database file names to pick up in directories")
+    parser.add_argument("--archive-name", default="archive", help="archive directory next to each database")
+    args = parser.parse_args()
+
+    db_paths = []
+    for path in args.paths:
+        db_paths.extend(find_databases(path, args.pattern) if os.path.isdir(path) else [path])
+
+    started = time.perf_counter()
+    merged = consolidate(db_paths, args.start, args.end, args.workers, args.archive_name)
+    filepath = write_csv(merged, args.out)
+    print(f"Consolidated {len(db_paths)} databases into {filepath} "
+          f"({len(merged)} rows) in {time.perf_counter() - started:.2f}s")
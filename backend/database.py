@@ -1,11 +1,47 @@
 import sqlite3
-from typing import List, Optional
+from typing import List, NamedTuple, Optional
 from items import Item
 from order import Order
 import csv
 import os
+import inventory
 from datetime import date
 
+# bump this whenever create_tables changes so existing files get upgraded
+SCHEMA_VERSION = 6
+
+# Order lifecycle. 'completed' is the paid state; the name is kept because the
+# EOD report, archive and existing databases already use it.
+ORDER_OPEN = "open"
+ORDER_SENT = "sent"
+ORDER_PAID = "completed"
+ORDER_VOIDED = "voided"
+ACTIVE_STATUSES = (ORDER_OPEN, ORDER_SENT)
+
+# status -> statuses it may move to
+ORDER_TRANSITIONS = {
+    ORDER_OPEN: (ORDER_SENT, ORDER_PAID, ORDER_VOIDED),
+    ORDER_SENT: (ORDER_OPEN, ORDER_PAID, ORDER_VOIDED),
+    ORDER_PAID: (),
+    ORDER_VOIDED: (),
+}
+
+
+class OrderRow(NamedTuple):
+    # one order from query_orders; items is a list of
+    # (item_id, item_name, quantity, price_at_order) when requested, otherwise None
+    order_id: int
+    customer_name: str
+    order_date: str
+    total_amount: float
+    status: str
+    items: Optional[list] = None
+
+
+class OrderPage(NamedTuple):
+    rows: List[OrderRow]
+    next_cursor: Optional[tuple]   # pass as `after` to get the next page, None on the last page
+
 
 class POSDatabase:
    #handles all database operations for the POS system using sqlite
@@ -17,6 +53,16 @@ class POSDatabase:
         self.cursor = None
         self.connect()
         self.create_tables()
+
+        # item IDs that can't be made right now; kept in memory so menu lookups
+        # can check availability without another query
+        self.out_of_stock = inventory.load_out_of_stock(self.cursor)
+
+        # called with (order_id, order day) after an order is paid, e.g. to drop cached reports
+        self.checkout_listeners = []
+
+        # called with item_id after an item is added, changed or removed, e.g. to drop cached items
+        self.item_listeners = []
     
     def close(self):
         #Close the database connection cleanly
@@ -41,8 +87,18 @@ class POSDatabase:
             print(f"Database connection error: {e}")
             raise
 
+    def schema_is_current(self) -> bool:
+        #Cheap check (one pragma read) so startup can skip the CREATE TABLE statements
+        try:
+            self.cursor.execute("PRAGMA user_version")
+            return self.cursor.fetchone()[0] >= SCHEMA_VERSION
+        except sqlite3.Error:
+            return False
+
     def create_tables(self):
         #Creates the tables for the POS system
+        if self.schema_is_current():
+            return
         try:
             # Items/Menu table
             self.cursor.execute("""
@@ -52,6 +108,7 @@ class POSDatabase:
                     description TEXT,
                     price REAL NOT NULL,
                     is_available INTEGER DEFAULT 1,
+                    out_of_stock INTEGER DEFAULT 0,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
@@ -63,7 +120,8 @@ class POSDatabase:
                     customer_name TEXT,
                     order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     total_amount REAL NOT NULL,
-                    status TEXT DEFAULT 'completed'
+                    status TEXT DEFAULT 'completed',
+                    terminal_id TEXT
                 )
             """)
 
@@ -80,6 +138,95 @@ class POSDatabase:
                 )
             """)
 
+            # Terminal that owns an open tab (added in schema 3)
+            self.cursor.execute("PRAGMA table_info(orders)")
+            if "terminal_id" not in [col[1] for col in self.cursor.fetchall()]:
+                self.cursor.execute("ALTER TABLE orders ADD COLUMN terminal_id TEXT")
+
+            # Partial index so the open tabs screen only touches open orders
+            self.cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_orders_open
+                ON orders(terminal_id, order_id)
+                WHERE status IN ('open', 'sent')
+            """)
+            self.cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_order_items_order
+                ON order_items(order_id, item_id)
+            """)
+            # Day and time range queries (analytics.py) (added in schema 5)
+            self.cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_orders_date
+                ON orders(order_date)
+            """)
+
+            # Inventory (added in schema 4, see inventory.py)
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS ingredients (
+                    ingredient_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL UNIQUE,
+                    stock REAL NOT NULL DEFAULT 0,
+                    low_stock_threshold REAL NOT NULL DEFAULT 0
+                )
+            """)
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS recipes (
+                    item_id INTEGER NOT NULL,
+                    ingredient_id INTEGER NOT NULL,
+                    quantity REAL NOT NULL,
+                    PRIMARY KEY (item_id, ingredient_id),
+                    FOREIGN KEY (item_id) REFERENCES items(item_id),
+                    FOREIGN KEY (ingredient_id) REFERENCES ingredients(ingredient_id) ON DELETE CASCADE
+                )
+            """)
+            self.cursor.execute("PRAGMA table_info(items)")
+            if "out_of_stock" not in [col[1] for col in self.cursor.fetchall()]:
+                self.cursor.execute("ALTER TABLE items ADD COLUMN out_of_stock INTEGER DEFAULT 0")
+
+            # Change log for incremental exports (see changefeed.py), filled by triggers
+            self.cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'order_changes'")
+            backfill_changes = self.cursor.fetchone() is None
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS order_changes (
+                    change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    order_id INTEGER NOT NULL,
+                    change_type TEXT NOT NULL,
+                    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            self.cursor.execute("""
+                CREATE TABLE IF NOT EXISTS sync_state (
+                    consumer TEXT PRIMARY KEY,
+                    last_change_id INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            for event, change_type in (("INSERT", "insert"), ("UPDATE", "update"), ("DELETE", "delete")):
+                row = "OLD" if event == "DELETE" else "NEW"
+                self.cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS orders_{change_type}_log
+                    AFTER {event} ON orders
+                    BEGIN
+                        INSERT INTO order_changes (order_id, change_type) VALUES ({row}.order_id, '{change_type}');
+                    END
+                """)
+                # Every line change is logged; an export already collapses them to one
+                # record per order. (Version 5 skipped repeats, which lost edits made
+                # after an export had moved past the order's last change, so replace it.)
+                self.cursor.execute(f"DROP TRIGGER IF EXISTS order_items_{change_type}_log")
+                self.cursor.execute(f"""
+                    CREATE TRIGGER order_items_{change_type}_log
+                    AFTER {event} ON order_items
+                    BEGIN
+                        INSERT INTO order_changes (order_id, change_type) VALUES ({row}.order_id, 'update');
+                    END
+                """)
+            if backfill_changes:
+                # Orders saved before the change log existed are picked up by the first export
+                self.cursor.execute("""
+                    INSERT INTO order_changes (order_id, change_type)
+                    SELECT order_id, 'insert' FROM orders ORDER BY order_id
+                """)
+
+            self.cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
             self.conn.commit()
             print("Database tables created successfully.")
         except sqlite3.Error as e:
@@ -96,6 +243,7 @@ class POSDatabase:
                 VALUES (?, ?, ?, ?)
             """, (item.itemID, item.name, item.description, item.price))
             self.conn.commit()
+            self._notify_item_change(item.itemID)
             return True
         except sqlite3.IntegrityError:
             print(f"Item with ID {item.itemID} already exists.")
@@ -106,11 +254,13 @@ class POSDatabase:
 
     def get_item(self, item_id: int) -> Optional[Item]:    # it can either return an item obj or none
         #Retrieves an item by its ID
+        if item_id in self.out_of_stock:
+            return None
         try:
             self.cursor.execute("""
                 SELECT item_id, name, description, price
                 FROM items
-                WHERE item_id = ? AND is_available = 1
+                WHERE item_id = ? AND is_available = 1 AND out_of_stock = 0
             """, (item_id,))
             
             row = self.cursor.fetchone()
@@ -121,13 +271,22 @@ class POSDatabase:
             print(f"Error retrieving item: {e}")
             return None
 
+    def item_exists(self, item_id: int) -> bool:
+        #True if the ID is in items at all, available or not (get_item only finds available ones)
+        try:
+            self.cursor.execute("SELECT 1 FROM items WHERE item_id = ?", (item_id,))
+            return self.cursor.fetchone() is not None
+        except sqlite3.Error as e:
+            print(f"Error checking item: {e}")
+            return False
+
     def get_all_items(self) -> List[Item]:
         #retrieves all available items from the database
         try:
             self.cursor.execute("""
                 SELECT item_id, name, description, price
                 FROM items
-                WHERE is_available = 1
+                WHERE is_available = 1 AND out_of_stock = 0
                 ORDER BY name
             """)
             
@@ -139,6 +298,59 @@ class POSDatabase:
             print(f"Error retrieving items: {e}")
             return []
 
+    def get_top_sellers(self, limit: int = 20, days: int = 30) -> List[Item]:
+        #Available items that sold the most over the last few days
+        try:
+            self.cursor.execute("""
+                SELECT i.item_id, i.name, i.description, i.price
+                FROM orders o
+                JOIN order_items oi ON o.order_id = oi.order_id
+                JOIN items i ON oi.item_id = i.item_id
+                WHERE o.status = 'completed'
+                AND o.order_date >= datetime('now', ?)
+                AND i.is_available = 1 AND i.out_of_stock = 0
+                GROUP BY i.item_id
+                ORDER BY SUM(oi.quantity) DESC
+                LIMIT ?
+            """, (f"-{days} days", limit))
+            return [Item(row[0], row[1], row[2], row[3]) for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error retrieving top sellers: {e}")
+            return []
+
+    @staticmethod
+    def load_menu(db_name: str) -> dict:
+        #Loads every available item keyed by item_id on its own read-only connection,
+        #so the GUI can warm its menu cache from a background thread. Out of stock
+        #items are included; callers check POSDatabase.out_of_stock
+        menu = {}
+        try:
+            conn = sqlite3.connect(f"file:{db_name}?mode=ro", uri=True)
+        except sqlite3.Error:
+            return menu
+        try:
+            for row in conn.execute("""
+                SELECT item_id, name, description, price
+                FROM items
+                WHERE is_available = 1
+            """):
+                menu[row[0]] = Item(row[0], row[1], row[2], row[3])
+        except sqlite3.Error as e:
+            print(f"Error loading menu: {e}")
+        finally:
+            conn.close()
+        return menu
+
+    def next_custom_item_id(self) -> int:
+        #Custom (ID 0) items are saved under negative IDs, this returns the next free one
+        try:
+            self.cursor.execute("SELECT MIN(item_id) FROM items")
+            lowest = self.cursor.fetchone()[0]
+            return min(lowest or 0, 0) - 1
+        except sqlite3.Error as e:
+            print(f"Error allocating custom item ID: {e}")
+            raise
+
     def update_item(self, item: Item) -> bool:
         #Updates an existing item in the database
         try:
@@ -148,7 +360,10 @@ class POSDatabase:
                 WHERE item_id = ?
             """, (item.name, item.description, item.price, item.itemID))
             self.conn.commit()
-            return self.cursor.rowcount > 0
+            changed = self.cursor.rowcount > 0
+            if changed:
+                self._notify_item_change(item.itemID)
+            return changed
         
         except sqlite3.Error as e:
             print(f"Error updating item: {e}")
@@ -164,33 +379,135 @@ class POSDatabase:
             """, (item_id,))
 
             self.conn.commit()
-            return self.cursor.rowcount > 0
+            changed = self.cursor.rowcount > 0
+            if changed:
+                self._notify_item_change(item_id)
+            return changed
         
         except sqlite3.Error as e:
             print(f"Error deleting item: {e}")
             return False
 
-    # order operations
+    def _notify_item_change(self, item_id: int):
+        for listener in self.item_listeners:
+            listener(item_id)
 
-    def save_order(self, order: Order, total_amount: float) -> Optional[int]:
-        #Saves a completed order to the database
+    def data_version(self) -> int:
+        #Changes whenever another connection (another register, the async writer, a script)
+        #commits to the file; writes through this connection don't change it
+        self.cursor.execute("PRAGMA data_version")
+        return self.cursor.fetchone()[0]
+
+    # inventory operations
+
+    def add_ingredient(self, name: str, stock: float = 0, low_stock_threshold: float = 0) -> Optional[int]:
+        #Adds an ingredient and returns its ID
         try:
-            #Inserts the order
             self.cursor.execute("""
-                INSERT INTO orders (customer_name, total_amount)
-                VALUES (?, ?)
-            """, (order.name, total_amount))
-            
-            order_id = self.cursor.lastrowid
+                INSERT INTO ingredients (name, stock, low_stock_threshold)
+                VALUES (?, ?, ?)
+            """, (name, stock, low_stock_threshold))
+            self.conn.commit()
+            return self.cursor.lastrowid
+        except sqlite3.IntegrityError:
+            print(f"Ingredient '{name}' already exists.")
+            return None
+        except sqlite3.Error as e:
+            print(f"Error adding ingredient: {e}")
+            return None
 
-            #Inserts all order items
-            for item, quantity in order.item_list:
+    def set_recipe(self, item_id: int, ingredient_id: int, quantity: float) -> bool:
+        #Sets how much of an ingredient one unit of an item uses (0 removes the link)
+        try:
+            if quantity > 0:
                 self.cursor.execute("""
-                    INSERT INTO order_items (order_id, item_id, quantity, price_at_order)
-                    VALUES (?, ?, ?, ?)
-                """, (order_id, item.itemID, quantity, item.price))
+                    INSERT INTO recipes (item_id, ingredient_id, quantity)
+                    VALUES (?, ?, ?)
+                    ON CONFLICT(item_id, ingredient_id) DO UPDATE SET quantity = excluded.quantity
+                """, (item_id, ingredient_id, quantity))
+            else:
+                self.cursor.execute("""
+                    DELETE FROM recipes WHERE item_id = ? AND ingredient_id = ?
+                """, (item_id, ingredient_id))
+            self.refresh_stock_flags()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error setting recipe: {e}")
+            self.conn.rollback()
+            return False
+
+    def restock(self, ingredient_id: int, amount: float) -> bool:
+        #Adds stock (negative amounts record waste) and updates item availability
+        try:
+            self.cursor.execute("""
+                UPDATE ingredients SET stock = stock + ? WHERE ingredient_id = ?
+            """, (amount, ingredient_id))
+            if self.cursor.rowcount == 0:
+                self.conn.rollback()
+                return False
+            self.refresh_stock_flags()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error restocking: {e}")
+            self.conn.rollback()
+            return False
+
+    def refresh_stock_flags(self):
+        #Recomputes out_of_stock for every item and commits
+        ran_out = inventory.mark_out_of_stock(self.cursor)
+        back = inventory.mark_back_in_stock(self.cursor)
+        self.conn.commit()
+        self.out_of_stock = (self.out_of_stock | ran_out) - back
+
+    def get_low_stock(self) -> List[dict]:
+        #Ingredients at or below their low stock threshold
+        try:
+            self.cursor.execute("""
+                SELECT ingredient_id, name, stock, low_stock_threshold
+                FROM ingredients
+                WHERE stock <= low_stock_threshold
+                ORDER BY name
+            """)
+            return [{
+                'ingredient_id': row[0],
+                'name': row[1],
+                'stock': row[2],
+                'low_stock_threshold': row[3]
+            } for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error retrieving low stock: {e}")
+            return []
+
+    # order operations
+
+    def _insert_order(self, order: Order, total_amount: float) -> tuple:
+        #Inserts a completed order without committing, returns (order_id, items that ran out)
+        #Inserts the order
+        self.cursor.execute("""
+            INSERT INTO orders (customer_name, total_amount)
+            VALUES (?, ?)
+        """, (order.name, total_amount))
+        
+        order_id = self.cursor.lastrowid
+
+        #Inserts all order items
+        self.cursor.executemany("""
+            INSERT INTO order_items (order_id, item_id, quantity, price_at_order)
+            VALUES (?, ?, ?, ?)
+        """, [(order_id, item.itemID, quantity, item.price) for item, quantity in order.item_list])
+
+        #Takes the ingredients out of stock in the same transaction
+        ran_out = inventory.consume_stock(self.cursor, order_id)
+        return order_id, ran_out
+
+    def save_order(self, order: Order, total_amount: float) -> Optional[int]:
+        #Saves a completed order to the database
+        try:
+            order_id, ran_out = self._insert_order(order, total_amount)
 
             self.conn.commit()
+            self.out_of_stock |= ran_out
+            self._notify_checkout(order_id)
             print(f"Order {order_id} saved successfully.")
             return order_id
         
@@ -199,18 +516,327 @@ class POSDatabase:
             self.conn.rollback()
             return None
 
-    def get_all_orders(self, limit: int = 100) -> List[dict]:
-        #Retrieves recent orders
+    def save_orders(self, batch: list) -> list:
+        #Saves many (order, total_amount) pairs with one commit (group commit).
+        #Each order gets its own savepoint, so one bad order doesn't sink the rest.
+        #Returns the new order IDs in the same order, None for any that failed.
+        order_ids = []
+        ran_out = set()
+        try:
+            self.cursor.execute("BEGIN")
+            for order, total_amount in batch:
+                self.cursor.execute("SAVEPOINT save_order")
+                try:
+                    order_id, order_ran_out = self._insert_order(order, total_amount)
+                    self.cursor.execute("RELEASE save_order")
+                    order_ids.append(order_id)
+                    ran_out |= order_ran_out
+                except Exception as e:
+                    # anything from one order (a database error, a malformed order)
+                    # only rolls back that order
+                    print(f"Error saving order: {e}")
+                    self.cursor.execute("ROLLBACK TO save_order")
+                    self.cursor.execute("RELEASE save_order")
+                    order_ids.append(None)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error saving orders: {e}")
+            self.conn.rollback()
+            return [None] * len(batch)
+        except Exception:
+            # e.g. a batch entry that isn't an (order, total) pair; don't leave the
+            # BEGIN open for the next caller
+            self.conn.rollback()
+            raise
+
+        self.out_of_stock |= ran_out
+        for order_id in order_ids:
+            if order_id is not None:
+                self._notify_checkout(order_id)
+        return order_ids
+
+    def open_order(self, customer_name: str = "", terminal_id: str | None = None,
+                   order_id: int | None = None) -> Optional[int]:
+        #Persists a new open tab and returns its order ID. A requested ID that is
+        #already taken (e.g. by another terminal) falls back to the next free one
+        try:
+            try:
+                self.cursor.execute("""
+                    INSERT INTO orders (order_id, customer_name, total_amount, status, terminal_id)
+                    VALUES (?, ?, 0, ?, ?)
+                """, (order_id, customer_name, ORDER_OPEN, terminal_id))
+            except sqlite3.IntegrityError:
+                self.cursor.execute("""
+                    INSERT INTO orders (customer_name, total_amount, status, terminal_id)
+                    VALUES (?, 0, ?, ?)
+                """, (customer_name, ORDER_OPEN, terminal_id))
+            self.conn.commit()
+            return self.cursor.lastrowid
+        except sqlite3.Error as e:
+            print(f"Error opening order: {e}")
+            self.conn.rollback()
+            return None
+
+    def add_order_line(self, order_id: int, item: Item, quantity: int) -> bool:
+        #Adds quantity of an item to an open order, merging with an existing line
+        try:
+            self.cursor.execute("""
+                UPDATE order_items
+                SET quantity = quantity + ?
+                WHERE order_id = ? AND item_id = ?
+                AND order_id IN (SELECT order_id FROM orders WHERE order_id = ? AND status IN ('open', 'sent'))
+            """, (quantity, order_id, item.itemID, order_id))
+            if self.cursor.rowcount == 0:
+                self.cursor.execute("""
+                    INSERT INTO order_items (order_id, item_id, quantity, price_at_order)
+                    SELECT order_id, ?, ?, ?
+                    FROM orders
+                    WHERE order_id = ? AND status IN ('open', 'sent')
+                """, (item.itemID, quantity, item.price, order_id))
+            self.conn.commit()
+            return self.cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error adding order line: {e}")
+            self.conn.rollback()
+            return False
+
+    def remove_order_line(self, order_id: int, item_id: int) -> bool:
+        #Removes an item from an open order
         try:
             self.cursor.execute("""
+                DELETE FROM order_items
+                WHERE order_id = ? AND item_id = ?
+                AND order_id IN (SELECT order_id FROM orders WHERE order_id = ? AND status IN ('open', 'sent'))
+            """, (order_id, item_id, order_id))
+            self.conn.commit()
+            return self.cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error removing order line: {e}")
+            self.conn.rollback()
+            return False
+
+    def set_order_status(self, order_id: int, status: str, total_amount: float | None = None) -> bool:
+        #Moves an order to a new status if the lifecycle allows it
+        allowed_from = [old for old, targets in ORDER_TRANSITIONS.items() if status in targets]
+        if not allowed_from:
+            raise ValueError(f"Invalid order status: {status}")
+        try:
+            placeholders = ",".join("?" * len(allowed_from))
+            self.cursor.execute(f"""
+                UPDATE orders
+                SET status = ?, total_amount = COALESCE(?, total_amount)
+                WHERE order_id = ? AND status IN ({placeholders})
+            """, (status, total_amount, order_id, *allowed_from))
+            changed = self.cursor.rowcount > 0
+
+            # Paying takes the ingredients out of stock in the same transaction
+            ran_out = set()
+            if changed and status == ORDER_PAID:
+                ran_out = inventory.consume_stock(self.cursor, order_id)
+
+            self.conn.commit()
+            self.out_of_stock |= ran_out
+            if changed and status == ORDER_PAID:
+                self._notify_checkout(order_id)
+            return changed
+        except sqlite3.Error as e:
+            print(f"Error updating order status: {e}")
+            self.conn.rollback()
+            return False
+
+    def _notify_checkout(self, order_id: int):
+        #Tells the checkout listeners which day's figures just changed
+        if not self.checkout_listeners:
+            return
+        try:
+            self.cursor.execute("SELECT date(order_date) FROM orders WHERE order_id = ?", (order_id,))
+            row = self.cursor.fetchone()
+        except sqlite3.Error as e:
+            print(f"Error notifying checkout listeners: {e}")
+            return
+        if row is None:
+            return
+        # The order is already committed, so a failing listener is reported, not raised:
+        # callers would otherwise treat a saved order as failed (and retry it)
+        for listener in self.checkout_listeners:
+            try:
+                listener(order_id, row[0])
+            except Exception as e:
+                print(f"Error in checkout listener: {e}")
+
+    def pay_order(self, order_id: int, total_amount: float) -> bool:
+        #Checks out an open order: only its status and total change
+        return self.set_order_status(order_id, ORDER_PAID, total_amount)
+
+    def void_order(self, order_id: int) -> bool:
+        return self.set_order_status(order_id, ORDER_VOIDED)
+
+    def get_open_orders(self, terminal_id: str | None = None) -> List[dict]:
+        #Open and sent tabs, optionally for one terminal (served by idx_orders_open)
+        try:
+            if terminal_id is None:
+                self.cursor.execute("""
+                    SELECT order_id, customer_name, order_date, total_amount, status, terminal_id
+                    FROM orders
+                    WHERE status IN ('open', 'sent')
+                    ORDER BY order_id
+                """)
+            else:
+                self.cursor.execute("""
+                    SELECT order_id, customer_name, order_date, total_amount, status, terminal_id
+                    FROM orders
+                    WHERE status IN ('open', 'sent') AND terminal_id = ?
+                    ORDER BY order_id
+                """, (terminal_id,))
+
+            return [{
+                'order_id': row[0],
+                'customer_name': row[1],
+                'order_date': row[2],
+                'total_amount': row[3],
+                'status': row[4],
+                'terminal_id': row[5]
+            } for row in self.cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error retrieving open orders: {e}")
+            return []
+
+    def load_order(self, order_id: int) -> Optional[Order]:
+        #Rebuilds an Order (with its lines) from the database
+        try:
+            self.cursor.execute("SELECT customer_name FROM orders WHERE order_id = ?", (order_id,))
+            row = self.cursor.fetchone()
+            if row is None:
+                return None
+            order = Order(order_id, row[0] or "")
+            self.cursor.execute("""
+                SELECT oi.item_id, i.name, i.description, oi.price_at_order, oi.quantity
+                FROM order_items oi
+                LEFT JOIN items i ON oi.item_id = i.item_id
+                WHERE oi.order_id = ?
+                ORDER BY oi.id
+            """, (order_id,))
+            for item_id, name, description, price, quantity in self.cursor.fetchall():
+                order.add_item(Item(item_id, name, description, price), quantity)
+            return order
+        except sqlite3.Error as e:
+            print(f"Error loading order: {e}")
+            return None
+
+    def _report_cursor(self, source=None):
+        #Cursor for a report query: the live connection, or a read-only connection
+        #to a snapshot (returned second so the caller can close it)
+        if source is None:
+            return self.cursor, None
+        if hasattr(source, "ensure_fresh"):
+            source = source.ensure_fresh()
+        conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+        return conn.cursor(), conn
+
+    def get_next_order_id(self) -> int:
+        #The ID the next order will get (max order_id + 1, read straight off the primary key)
+        try:
+            self.cursor.execute("SELECT COALESCE(MAX(order_id), 0) + 1 FROM orders")
+            return self.cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error retrieving next order ID: {e}")
+            return 1
+
+    def query_orders(self, limit: int = 50, after: tuple | None = None,
+                     start: str | None = None, end: str | None = None,
+                     customer: str | None = None, status=None,
+                     min_total: float | None = None, max_total: float | None = None,
+                     include_items: bool = False, newest_first: bool = True) -> OrderPage:
+        #Order history one page at a time, keyset paginated on (order_date, order_id) so
+        #page 100 costs the same as page 1.
+        #start/end: order_date range (end exclusive, 'YYYY-MM-DD' or full timestamps)
+        #customer: part of the customer name; status: one status or a list of them
+        #include_items: fetch the lines of the whole page in one extra query
+        conditions = []
+        params = []
+        if start is not None:
+            conditions.append("order_date >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("order_date < ?")
+            params.append(end)
+        if customer:
+            conditions.append("customer_name LIKE ?")
+            params.append(f"%{customer}%")
+        if status is not None:
+            statuses = [status] if isinstance(status, str) else list(status)
+            conditions.append(f"status IN ({','.join('?' * len(statuses))})")
+            params.extend(statuses)
+        if min_total is not None:
+            conditions.append("total_amount >= ?")
+            params.append(min_total)
+        if max_total is not None:
+            conditions.append("total_amount <= ?")
+            params.append(max_total)
+        if after is not None:
+            conditions.append(f"(order_date, order_id) {'<' if newest_first else '>'} (?, ?)")
+            params.extend(after)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = "DESC" if newest_first else "ASC"
+        try:
+            self.cursor.execute(f"""
                 SELECT order_id, customer_name, order_date, total_amount, status
                 FROM orders
-                ORDER BY order_date DESC
+                {where}
+                ORDER BY order_date {direction}, order_id {direction}
+                LIMIT ?
+            """, (*params, limit))
+            rows = [OrderRow(*row) for row in self.cursor.fetchall()]
+
+            if include_items and rows:
+                # One query for the whole page instead of one per order
+                placeholders = ",".join("?" * len(rows))
+                lines = {}
+                self.cursor.execute(f"""
+                    SELECT oi.order_id, oi.item_id, i.name, oi.quantity, oi.price_at_order
+                    FROM order_items oi
+                    LEFT JOIN items i ON oi.item_id = i.item_id
+                    WHERE oi.order_id IN ({placeholders})
+                    ORDER BY oi.id
+                """, [row.order_id for row in rows])
+                for order_id, *line in self.cursor.fetchall():
+                    lines.setdefault(order_id, []).append(tuple(line))
+                rows = [row._replace(items=lines.get(row.order_id, [])) for row in rows]
+
+            next_cursor = None
+            if len(rows) == limit:
+                next_cursor = (rows[-1].order_date, rows[-1].order_id)
+            return OrderPage(rows, next_cursor)
+
+        except sqlite3.Error as e:
+            print(f"Error querying orders: {e}")
+            return OrderPage([], None)
+
+    def iter_orders(self, page_size: int = 500, **filters):
+        #Every order matching the query_orders filters, fetched a page at a time
+        after = None
+        while True:
+            page = self.query_orders(limit=page_size, after=after, **filters)
+            yield from page.rows
+            if page.next_cursor is None:
+                return
+            after = page.next_cursor
+
+    def get_all_orders(self, limit: int = 100, source=None) -> List[dict]:
+        #Retrieves recent orders (from a snapshot if a source is given, see export_end_of_day_csv)
+        snapshot_conn = None
+        try:
+            cursor, snapshot_conn = self._report_cursor(source)
+            cursor.execute("""
+                SELECT order_id, customer_name, order_date, total_amount, status
+                FROM orders
+                ORDER BY order_date DESC, order_id DESC
                 LIMIT ?
             """, (limit,))
             
             orders = []
-            for row in self.cursor.fetchall():
+            for row in cursor.fetchall():
                 orders.append({
                     'order_id': row[0],
                     'customer_name': row[1],
@@ -223,16 +849,35 @@ class POSDatabase:
         except sqlite3.Error as e:
             print(f"Error retrieving orders: {e}")
             return []
+        finally:
+            if snapshot_conn is not None:
+                snapshot_conn.close()
+
+    def archive_closed_days(self, before: str | None = None, archive_dir: str = "archive") -> dict:
+        #Moves completed orders from days before `before` (default today) into the numpy archive
+        import archive
+        return archive.archive_closed_days(self.conn, before, archive_dir)
+
+    def export_changes(self, out_path: str, consumer: str = "default", fmt: str = "ndjson") -> int:
+        #Writes orders created or changed since this consumer's last export, returns how many
+        import changefeed
+        return changefeed.export_changes(self.conn, out_path, consumer, fmt)
+
 # export to .csv
-    def export_end_of_day_csv(self, report_date: str | None = None, out_dir: str = "reports") -> str | None:
+    def export_end_of_day_csv(self, report_date: str | None = None, out_dir: str = "reports",
+                              archive_dir: str = "archive", source=None) -> str | None:
+        #source: optional snapshot to report from instead of the live database
+        #(a file path or a snapshot.SnapshotScheduler)
         if report_date is None:
             report_date = date.today().isoformat()
 
         os.makedirs(out_dir, exist_ok=True)
         filepath = os.path.join(out_dir, f"end_of_day_{report_date}.csv")
 
+        snapshot_conn = None
         try:
-            self.cursor.execute("""
+            cursor, snapshot_conn = self._report_cursor(source)
+            cursor.execute("""
                 SELECT
                     o.order_id,
                     date(o.order_date) as order_date,
@@ -251,8 +896,19 @@ class POSDatabase:
                 ORDER BY o.order_id ASC
             """, (report_date,))
 
-            cols = [d[0] for d in self.cursor.description]
-            rows = self.cursor.fetchall()
+            cols = [d[0] for d in cursor.description]
+            rows = cursor.fetchall()
+
+            # Closed days may have been moved to the columnar archive
+            archive_file = os.path.join(archive_dir, f"orders_{report_date}.npy")
+            if os.path.exists(archive_file):
+                import archive
+                cursor.execute("SELECT item_id, name FROM items")
+                item_names = dict(cursor.fetchall())
+                # an order still in the live tables too (archive interrupted) is only reported from there
+                live_orders = {r[0] for r in rows}
+                rows = sorted(archive.day_report_rows(report_date, item_names, archive_dir, live_orders) + rows,
+                              key=lambda r: r[0])
 
             with open(filepath, "w", newline="", encoding="utf-8") as f:
                 writer = csv.writer(f)
@@ -263,3 +919,6 @@ class POSDatabase:
         except Exception as e:
             print(f"Error exporting end-of-day report: {e}")
             return None
+        finally:
+            if snapshot_conn is not None:
+                snapshot_conn.close()
@@ -1,24 +1,45 @@
+import os
+import sys
+import threading
+import startup_profile
 import tkinter as tk
 from tkinter import messagebox
-from database import POSDatabase
-from orderCheckout import OrderCheckout
-from takeOrder import TakeOrder
-from items import Item
-from order import Order
+from tkinter import ttk
+# the register engine (and with it sqlite3) is imported lazily so the
+# window can appear before the database is opened and the schema is checked
 #import add_menu_items
 
+DB_NAME = "restaurant.db"
+# identifies this register's open tabs when several share one database
+TERMINAL_ID = os.environ.get("POS_TERMINAL_ID", "register-1")
+# crash-recovery log of the open orders (see orderJournal.py)
+JOURNAL_PATH = "register.journal"
+# older messages are dropped so the log doesn't grow forever
+MAX_LOG_LINES = 200
+# typing in the Item ID box looks the item up once it pauses for this long
+LOOKUP_DEBOUNCE_MS = 250
+# database housekeeping runs once no order has changed for this long (see maintenance.py)
+MAINTENANCE_IDLE_SECONDS = 600
+# paid/voided orders older than this many days are deleted; unset keeps everything
+RETENTION_DAYS = int(os.environ["POS_RETENTION_DAYS"]) if os.environ.get("POS_RETENTION_DAYS") else None
+
 
 class OrderApp:
-    def __init__(self, root):
+    def __init__(self, root, db_name: str = DB_NAME):
         self.root = root
         self.root.title("Restaurant Ordering System")
 
-        # Initialize database
-        self.db = POSDatabase("restaurant.db")
-        self.take_order = TakeOrder()
-        
-        # Get next order ID
-        self.next_order_id = self.get_next_order_id()
+        # The register engine does all the order work; it is opened on first use
+        self.db_name = db_name
+        self._register = None
+        self._maintenance = None
+
+        # Item ID last shown in the item fields, and the pending debounced lookup
+        self._last_lookup_id = None
+        self._lookup_after_id = None
+
+        # Order ID is filled in once the database is open
+        self.next_order_id = None
 
         self.top_frame = tk.Frame(root)
         self.top_frame.pack(pady=10)
@@ -46,6 +67,7 @@ class OrderApp:
         self.item_id_entry.grid(row=0, column=1)
         self.item_id_entry.bind('<Return>', self.lookup_item)  # Lookup on Enter key
         self.item_id_entry.bind('<FocusOut>', self.lookup_item)  # Lookup on tab/click away
+        self.item_id_entry.bind('<KeyRelease>', self.schedule_lookup)  # Lookup once typing pauses
         
         tk.Button(self.middle_frame, text="🔍", command=self.lookup_item, width=3).grid(row=0, column=2)
 
@@ -71,18 +93,82 @@ class OrderApp:
         tk.Button(self.bottom_frame, text="Checkout", command=self.checkout).grid(row=0, column=1, padx=5)
         tk.Button(self.bottom_frame, text="Cancel Order", command=self.cancel_order).grid(row=0, column=2, padx=5)
 
-        self.display = tk.Text(root, height=10, width=50, state='disabled')
+        # Line items of the current order, redrawn from the Order (see refresh_order_view)
+        self.order_view = ttk.Treeview(root, columns=("qty", "name", "price", "total"),
+                                       show="headings", height=8)
+        for column, heading, width in (("qty", "Qty", 50), ("name", "Item", 200),
+                                       ("price", "Price", 80), ("total", "Total", 80)):
+            self.order_view.heading(column, text=heading)
+            self.order_view.column(column, width=width, anchor='w' if column == "name" else 'e')
+        self.order_view.pack(pady=(10, 0))
+
+        self.total_label = tk.Label(root, text="")
+        self.total_label.pack(anchor='e', padx=10)
+
+        self.display = tk.Text(root, height=5, width=50, state='disabled')
         self.display.pack(pady=10)
+
+        # Messages and order redraws are batched into one update per event loop tick
+        self._pending_messages = []
+        self._messages_scheduled = False
+        self._order_view_scheduled = False
+        self._shown_lines = {}
         
-        # Sets initial order ID
+        startup_profile.mark("window built")
+
+        # Open the database after the first frame has been drawn
+        self.root.after_idle(lambda: self.root.after(0, self.finish_startup))
+
+    @property
+    def register(self):
+        #Opens the register (and its database) the first time anything needs it
+        if self._register is None:
+            from register import Register
+            self._register = Register(self.db_name, TERMINAL_ID, journal_path=JOURNAL_PATH)
+        return self._register
+
+    @property
+    def db(self):
+        return self.register.db
+
+    def finish_startup(self):
+        #Runs once the window is visible: opens the db, fills in the order ID
+        #and warms the menu cache on a background thread
+        startup_profile.mark("first frame drawn")
+        self.next_order_id = self.get_next_order_id()
         self.update_order_id_display()
+        self.resume_open_order()
+        startup_profile.mark("ready for first order")
+
+        # Best sellers first (one small query), then the whole menu in the background
+        self.register.lookup.prefetch_top_sellers()
+        threading.Thread(target=self.warm_menu_cache, args=(self.register.lookup,), daemon=True).start()
+
+        from maintenance import MaintenanceScheduler
+        self._maintenance = MaintenanceScheduler(self.db_name, self.register.take_order,
+                                                 idle_seconds=MAINTENANCE_IDLE_SECONDS,
+                                                 retention_days=RETENTION_DAYS)
+        self._maintenance.start()
+
+        if "--timing" in sys.argv:
+            startup_profile.report()
+
+    def resume_open_order(self):
+        #Picks up the most recent tab this register left open (e.g. after a restart)
+        order = self.register.resume()
+        if order is None:
+            return
+        self.display_message(f"Resumed open Order #{order.orderID} for {order.name}")
+        self.refresh_order_view()
+
+    def warm_menu_cache(self, lookup):
+        #Background thread: loads the menu on its own connection
+        from database import POSDatabase
+        lookup.menu = POSDatabase.load_menu(self.db_name)
 
     def get_next_order_id(self):
         #Gets the next available order ID
-        orders = self.db.get_all_orders(limit=1)
-        if orders:
-            return orders[0]['order_id'] + 1
-        return 1
+        return self.register.next_order_id()
 
     def update_order_id_display(self):
         #Updates the order ID field
@@ -91,8 +177,20 @@ class OrderApp:
         self.order_id_entry.insert(0, str(self.next_order_id))
         self.order_id_entry.config(state='readonly')
 
-    def lookup_item(self, event=None):
-        #Look up item from database by ID
+    def schedule_lookup(self, event=None):
+        #Restarts the debounce timer on every key press in the Item ID box
+        if event is not None and event.keysym in ("Return", "Tab", "ISO_Left_Tab"):
+            return
+        if self._lookup_after_id is not None:
+            self.root.after_cancel(self._lookup_after_id)
+        self._lookup_after_id = self.root.after(
+            LOOKUP_DEBOUNCE_MS, lambda: self.lookup_item(move_focus=False))
+
+    def lookup_item(self, event=None, move_focus: bool = True):
+        #Look up item by ID (see ItemLookup for the caching)
+        if self._lookup_after_id is not None:
+            self.root.after_cancel(self._lookup_after_id)
+            self._lookup_after_id = None
         try:
             item_id_str = self.item_id_entry.get().strip()
             if not item_id_str:
@@ -101,7 +199,9 @@ class OrderApp:
             item_id = int(item_id_str)
             
             # Prevent duplicate lookups for the same item
-            if hasattr(self, '_last_lookup_id') and self._last_lookup_id == item_id:
+            if self._last_lookup_id == item_id:
+                if move_focus and self.item_name_entry.cget('state') == 'readonly':
+                    self.item_qty_entry.focus()
                 return
             
             self._last_lookup_id = item_id
@@ -113,8 +213,13 @@ class OrderApp:
                 self.display_message("💡 Custom item - enter details manually")
                 return
             
-            # Look up item in database
-            item = self.db.get_item(item_id)
+            # Items that ran out of stock are known without a query. They can't be
+            # sold, so the fields stay read-only rather than opening manual entry
+            if item_id in self.db.out_of_stock:
+                self.show_unavailable(item_id, "is out of stock")
+                return
+
+            item = self.register.find_item(item_id)
             
             if item:
                 # Auto-fill fields
@@ -133,9 +238,12 @@ class OrderApp:
                 self.item_price_entry.config(state='readonly')
                 
                 # Focus on quantity
-                self.item_qty_entry.focus()
+                if move_focus:
+                    self.item_qty_entry.focus()
                 
                 self.display_message(f" Found: {item.name} - ${item.price:.2f}")
+            elif self.db.item_exists(item_id):
+                self.show_unavailable(item_id, "is not available")
             else:
                 self.clear_item_fields()
                 self.enable_item_fields()
@@ -144,6 +252,14 @@ class OrderApp:
         except ValueError:
             pass  # Ignore if not a valid number
 
+    def show_unavailable(self, item_id, reason):
+        #Menu item that exists but can't be sold right now
+        self.clear_item_fields()
+        self.item_name_entry.config(state='readonly')
+        self.item_desc_entry.config(state='readonly')
+        self.item_price_entry.config(state='readonly')
+        self.display_message(f" Item ID {item_id} {reason}")
+
     def clear_item_fields(self):
         #Clears all item entry fields
         self.item_name_entry.delete(0, tk.END)
@@ -164,27 +280,28 @@ class OrderApp:
                 return
             
             # Check if there's already an active order
-            if self.take_order.current_order is not None:
+            if self.register.current_order is not None:
                 response = messagebox.askyesno(
                     "Active Order", 
                     "There is already an active order. Do you want to cancel it and start a new one?"
                 )
                 if response:
-                    self.take_order.cancel_order()
+                    self.register.cancel_order()
                     self.display_message("Previous order cancelled.\n")
                 else:
                     return
             
             # Clear previous order messages
-            self.display.config(state='normal')
-            self.display.delete('1.0', tk.END)
-            self.display.config(state='disabled')
+            self.clear_messages()
             
-            # Start the order
-            self.take_order.start_new_order(self.next_order_id, customer_name)
+            # Start the order, the database hands out the ID
+            order = self.register.start_order(customer_name)
+            self.next_order_id = order.orderID
+            self.update_order_id_display()
             
             # Show the new order message
             self.display_message(f"✓ Started Order #{self.next_order_id} for {customer_name}")
+            self.refresh_order_view()
             
             # Clear customer name field
             self.customer_name_entry.delete(0, tk.END)
@@ -209,27 +326,15 @@ class OrderApp:
             
             qty = int(self.item_qty_entry.get())
 
-            item = Item(item_id, name, desc, price)
-            
-            # Save custom items id 0 to database with a unique ID
-            if item_id == 0:
-                # Generates a unique custom ID !!!!!(use negative numbers for custom items)
-                all_orders = self.db.get_all_orders(limit=1000)
-                custom_id = -1 - len(all_orders)
-                item = Item(custom_id, name, desc, price)
-                self.db.add_item(item)
+            # Custom items (ID 0) and unknown IDs are saved to the menu by the register
+            item, saved = self.register.add_item(item_id, qty, name, desc, price)
+            if saved and item_id == 0:
                 self.display_message(f"Custom item '{name}' saved to database")
-
-            else:
-                # Save item to database if it doesn't exist
-                existing = self.db.get_item(item_id)
-
-                if not existing:
-                    self.db.add_item(item)
-                    self.display_message(f"Item '{name}' added to database")
+            elif saved:
+                self.display_message(f"Item '{name}' added to database")
             
-            self.take_order.add_item_to_order(item, qty)
             self.display_message(f"Added {qty} x {name} (${price:.2f})")
+            self.refresh_order_view()
             
             # Clear item fields
             self.item_id_entry.delete(0, tk.END)
@@ -251,8 +356,9 @@ class OrderApp:
     def remove_item(self):
         try:
             item_id = int(self.item_id_entry.get())
-            self.take_order.remove_item_from_order(item_id)
+            self.register.remove_item(item_id)
             self.display_message(f"Removed item with ID {item_id}")
+            self.refresh_order_view()
         except ValueError:
             messagebox.showerror("Error", "Item ID must be an integer.")
         except Exception as e:
@@ -260,25 +366,14 @@ class OrderApp:
 
     def checkout(self):
         try:
-            if self.take_order.current_order is None:
-                raise ValueError("No active order to checkout.")
-            
-            # Calculate total
-            checkout_obj = OrderCheckout(self.take_order.current_order)
-            total = checkout_obj.calculate_total()
+            # Calculate total and mark the saved order as paid
+            order_id, total = self.register.checkout()
             
-            # Save order to database
-            order_id = self.db.save_order(self.take_order.current_order, total)
+            self.display_message(f" Order #{order_id} checked out - Total: ${total:.2f}")
+            self.refresh_order_view()
             
-            # Update order history
-            self.take_order.order_history.append(self.take_order.current_order)
-            self.take_order.current_order = None
-            
-            self.display_message(f" Order #{self.next_order_id} checked out - Total: ${total:.2f}")
-            self.display_message(f" Saved to database as Order #{order_id}")
-            
-            # Increment order ID for next order
-            self.next_order_id += 1
+            # Next order ID
+            self.next_order_id = self.get_next_order_id()
             self.update_order_id_display()
             
             # Clear customer name
@@ -289,8 +384,9 @@ class OrderApp:
 
     def cancel_order(self):
         try:
-            self.take_order.cancel_order()
+            self.register.cancel_order()
             self.display_message("Order cancelled.")
+            self.refresh_order_view()
             
             # Clear customer name
             self.customer_name_entry.delete(0, tk.END)
@@ -298,20 +394,81 @@ class OrderApp:
             messagebox.showerror("Error", str(e))
 
     def display_message(self, msg: str):
+        #Queues a message; everything queued in one event loop tick is written at once
+        self._pending_messages.append(msg)
+        if not self._messages_scheduled:
+            self._messages_scheduled = True
+            self.root.after_idle(self.flush_messages)
+
+    def flush_messages(self):
+        self._messages_scheduled = False
+        if not self._pending_messages:
+            return
+        text = "\n".join(self._pending_messages) + "\n"
+        self._pending_messages = []
+
         self.display.config(state='normal')  # Enable to write
-        self.display.insert(tk.END, msg + "\n")
+        self.display.insert(tk.END, text)
+
+        # Drop the oldest lines once the log is over its cap
+        line_count = int(self.display.index('end-1c').split('.')[0]) - 1
+        if line_count > MAX_LOG_LINES:
+            self.display.delete('1.0', f'{line_count - MAX_LOG_LINES + 1}.0')
+
         self.display.see(tk.END)
         self.display.config(state='disabled')  # Disable again
 
+    def clear_messages(self):
+        self._pending_messages = []
+        self.display.config(state='normal')
+        self.display.delete('1.0', tk.END)
+        self.display.config(state='disabled')
+
+    def refresh_order_view(self):
+        #Schedules one redraw of the line items for the end of this event loop tick
+        if not self._order_view_scheduled:
+            self._order_view_scheduled = True
+            self.root.after_idle(self.redraw_order_view)
+
+    def redraw_order_view(self):
+        #Only touches the rows whose item was added, changed or removed
+        self._order_view_scheduled = False
+        order = self.register.current_order
+
+        lines = {}
+        if order is not None:
+            for item, quantity in order.item_list:
+                lines[str(item.itemID)] = (quantity, item.name, f"${item.price:.2f}",
+                                           f"${item.price * quantity:.2f}")
+
+        for iid in self._shown_lines.keys() - lines.keys():
+            self.order_view.delete(iid)
+        for iid, values in lines.items():
+            shown = self._shown_lines.get(iid)
+            if shown is None:
+                self.order_view.insert('', tk.END, iid=iid, values=values)
+            elif shown != values:
+                self.order_view.item(iid, values=values)
+        self._shown_lines = lines
+
+        if order is None:
+            self.total_label.config(text="")
+        else:
+            from orderCheckout import OrderCheckout
+            self.total_label.config(text=f"Total with tax: ${OrderCheckout(order).calculate_total():.2f}")
+
     def on_closing(self):
         #Cleans up database connection when closing
-        if hasattr(self, 'db'):
-            self.db.close()
+        if self._maintenance is not None:
+            self._maintenance.stop()
+        if self._register is not None:
+            self._register.close()
         self.root.destroy()
 
 
 if __name__ == "__main__":
     root = tk.Tk()
+    startup_profile.mark("tk initialised")
     app = OrderApp(root)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
\ No newline at end of file
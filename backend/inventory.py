@@ -0,0 +1,68 @@
+import sqlite3
+
+# Stock tracking for ingredients.
+# recipes links each menu item to the ingredients (and amounts) one unit uses.
+# When an order is paid, POSDatabase calls consume_stock inside the same
+# transaction, so stock and the order are always committed together.
+# Items whose ingredients run low get items.out_of_stock = 1; this is separate
+# from is_available so restocking never brings back an item removed by hand.
+# These helpers never commit; the caller owns the transaction.
+
+
+def consume_stock(cursor: sqlite3.Cursor, order_id: int) -> set:
+    #Takes one order's ingredients out of stock in a single UPDATE and returns
+    #the item IDs that just ran out
+    cursor.execute("""
+        UPDATE ingredients
+        SET stock = stock - used.amount
+        FROM (
+            SELECT r.ingredient_id, SUM(r.quantity * oi.quantity) AS amount
+            FROM order_items oi
+            JOIN recipes r ON r.item_id = oi.item_id
+            WHERE oi.order_id = ?
+            GROUP BY r.ingredient_id
+        ) AS used
+        WHERE ingredients.ingredient_id = used.ingredient_id
+    """, (order_id,))
+    if cursor.rowcount <= 0:
+        return set()
+    return mark_out_of_stock(cursor)
+
+
+def mark_out_of_stock(cursor: sqlite3.Cursor) -> set:
+    #Flags items that can no longer be made, returns the newly flagged IDs
+    cursor.execute("""
+        UPDATE items
+        SET out_of_stock = 1
+        WHERE out_of_stock = 0
+        AND item_id IN (
+            SELECT r.item_id
+            FROM recipes r
+            JOIN ingredients g ON g.ingredient_id = r.ingredient_id
+            WHERE g.stock <= g.low_stock_threshold OR g.stock < r.quantity
+        )
+        RETURNING item_id
+    """)
+    return {row[0] for row in cursor.fetchall()}
+
+
+def mark_back_in_stock(cursor: sqlite3.Cursor) -> set:
+    #Clears the flag on items whose ingredients are all above their thresholds again
+    cursor.execute("""
+        UPDATE items
+        SET out_of_stock = 0
+        WHERE out_of_stock = 1
+        AND item_id NOT IN (
+            SELECT r.item_id
+            FROM recipes r
+            JOIN ingredients g ON g.ingredient_id = r.ingredient_id
+            WHERE g.stock <= g.low_stock_threshold OR g.stock < r.quantity
+        )
+        RETURNING item_id
+    """)
+    return {row[0] for row in cursor.fetchall()}
+
+
+def load_out_of_stock(cursor: sqlite3.Cursor) -> set:
+    cursor.execute("SELECT item_id FROM items WHERE out_of_stock = 1")
+    return {row[0] for row in cursor.fetchall()}
@@ -0,0 +1,94 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+from items import Item
+
+
+class ItemLookup:
+    # Answers "which item is this ID?" for the register with as few queries as possible.
+    # Checks, in order: the last lookup (so add_item reuses it), a small LRU of recent
+    # items, the warmed menu, and only then the database.
+    # Items changed through this database are dropped right away (item_listeners). Changes
+    # committed by other connections are noticed through PRAGMA data_version, checked at
+    # most every `check_every` seconds since the pragma costs about as much as get_item.
+
+    def __init__(self, database, capacity: int = 64, check_every: float = 1.0):
+
+        self.database = database
+        self.capacity = capacity
+        self.check_every = check_every
+
+        # item_id -> Item for recently looked up items, most recent last
+        self.recent = OrderedDict()
+
+        # full menu loaded in the background at startup (item_id -> Item)
+        self.menu = {}
+
+        # (item_id, Item or None) of the last lookup, misses included
+        self.last = None
+
+        self._data_version = database.data_version()
+        self._checked_at = time.monotonic()
+
+        database.item_listeners.append(self.forget)
+
+    def lookup(self, item_id: int) -> Optional[Item]:
+        # Returns the available item with this ID, or None
+        if item_id in self.database.out_of_stock:
+            return None
+
+        self._check_version()
+
+        if self.last is not None and self.last[0] == item_id:
+            return self.last[1]
+
+        item = self.recent.get(item_id)
+        if item is not None:
+            self.recent.move_to_end(item_id)
+        else:
+            item = self.menu.get(item_id) or self.database.get_item(item_id)
+            if item is not None:
+                self.remember(item)
+
+        self.last = (item_id, item)
+        return item
+
+    def remember(self, item: Item):
+        # Adds an item to the LRU, e.g. one just saved to the database
+        self.recent[item.itemID] = item
+        self.recent.move_to_end(item.itemID)
+        while len(self.recent) > self.capacity:
+            self.recent.popitem(last=False)
+        if self.last is not None and self.last[0] == item.itemID:
+            self.last = (item.itemID, item)
+
+    def forget(self, item_id: int):
+        # Drops an item that was changed or removed
+        self.recent.pop(item_id, None)
+        self.menu.pop(item_id, None)
+        if self.last is not None and self.last[0] == item_id:
+            self.last = None
+
+    def clear(self):
+        # Drops everything cached, including the warmed menu
+        self.recent.clear()
+        self.menu = {}
+        self.last = None
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_every:
+            return
+        self._checked_at = now
+        version = self.database.data_version()
+        if version != self._data_version:
+            # something else wrote to the file, we can't tell which items changed
+            self._data_version = version
+            self.clear()
+
+    def prefetch_top_sellers(self, limit: int = 20) -> int:
+        # Loads the best selling items into the LRU, returns how many were loaded
+        top = self.database.get_top_sellers(min(limit, self.capacity))
+        for item in reversed(top):  # best seller ends up most recent
+            self.remember(item)
+        return len(top)
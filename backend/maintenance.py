@@ -0,0 +1,234 @@
+import os
+import time
+import sqlite3
+import threading
+from database import POSDatabase
+
+# Database housekeeping for the register, meant to run while nobody is ringing up orders:
+#   - retention: deletes paid/voided orders older than N days (off unless configured),
+#     soft-deleted items no order or archived day refers to, and change-log rows every
+#     sync has consumed. Pruned orders are not reported to syncs as deletions.
+#   - incremental vacuum: hands free pages back to the file system a batch at a time
+#     (the first run switches the file to auto_vacuum=INCREMENTAL with one full VACUUM)
+#   - ANALYZE / PRAGMA optimize so the planner has statistics for the indexes
+#   - WAL checkpoint when the file is in WAL mode
+# Every run reports file size, free pages and the plan and timing of the queries on the
+# checkout path, before and after, so the effect on checkout latency is visible.
+
+# queries the register runs on every scan/checkout: (name, sql, params)
+CHECKOUT_QUERIES = [
+    ("item lookup", """
+        SELECT item_id, name, description, price FROM items
+        WHERE item_id = ? AND is_available = 1 AND out_of_stock = 0
+    """, (1,)),
+    ("open tabs", """
+        SELECT order_id FROM orders
+        WHERE status IN ('open', 'sent') AND terminal_id = ?
+    """, ("register-1",)),
+    ("order lines", """
+        SELECT item_id, quantity FROM order_items WHERE order_id = ?
+    """, (1,)),
+    ("next order id", "SELECT COALESCE(MAX(order_id), 0) + 1 FROM orders", ()),
+]
+
+
+def file_stats(conn: sqlite3.Connection) -> dict:
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {
+        'size_bytes': page_size * page_count,
+        'pages': page_count,
+        'free_pages': free_pages,
+    }
+
+
+def query_stats(conn: sqlite3.Connection, runs: int = 200) -> dict:
+    #name -> (query plan, average microseconds per run)
+    stats = {}
+    for name, sql, params in CHECKOUT_QUERIES:
+        plan = "; ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        started = time.perf_counter()
+        for _ in range(runs):
+            conn.execute(sql, params).fetchall()
+        stats[name] = (plan, (time.perf_counter() - started) / runs * 1_000_000)
+    return stats
+
+
+def apply_retention(conn: sqlite3.Connection, retention_days: int | None,
+                    archive_dir: str = "archive") -> dict:
+    #Deletes what is no longer needed and returns how many rows of each kind went
+    removed = {'orders': 0, 'items': 0, 'changes': 0}
+    if retention_days is not None:
+        # Hold the write lock so the only change rows after last_change are our own
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            last_change = conn.execute("SELECT COALESCE(MAX(change_id), 0) FROM order_changes").fetchone()[0]
+            cursor = conn.execute("""
+                DELETE FROM orders
+                WHERE status IN ('completed', 'voided')
+                AND order_date < datetime('now', ?)
+            """, (f"-{retention_days} days",))
+            removed['orders'] = cursor.rowcount
+            # Pruning is not a deletion as far as incremental syncs are concerned
+            conn.execute("DELETE FROM order_changes WHERE change_id > ?", (last_change,))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    # Items removed with delete_item that no order line points at any more. Archived
+    # days still look their item names up in items, so those are kept too.
+    import archive   # pulls in numpy, so only once maintenance actually runs
+    try:
+        keep = archive.archived_item_ids(archive_dir)
+    except RuntimeError:
+        keep = None    # archive files but no numpy to read them: don't guess
+    if keep is not None:
+        cursor = conn.execute("""
+            SELECT item_id FROM items
+            WHERE is_available = 0
+            AND NOT EXISTS (SELECT 1 FROM order_items oi WHERE oi.item_id = items.item_id)
+            AND NOT EXISTS (SELECT 1 FROM recipes r WHERE r.item_id = items.item_id)
+        """)
+        unused = [(item_id,) for (item_id,) in cursor.fetchall() if item_id not in keep]
+        conn.executemany("DELETE FROM items WHERE item_id = ?", unused)
+        removed['items'] = len(unused)
+
+    # Change-log rows that every incremental export has already sent
+    cursor = conn.execute("""
+        DELETE FROM order_changes
+        WHERE change_id <= (SELECT MIN(last_change_id) FROM sync_state)
+    """)
+    removed['changes'] = max(cursor.rowcount, 0)
+    conn.commit()
+    return removed
+
+
+def run_maintenance(db_name: str, retention_days: int | None = None,
+                    vacuum_pages: int = 1000, archive_dir: str = "archive") -> dict:
+    #One maintenance pass on its own connection; returns a report (see print_report).
+    #POSDatabase brings an older file up to the current schema and turns on foreign
+    #keys, so deleted orders take their lines with them.
+    db = POSDatabase(db_name)
+    conn = db.conn
+    report = {'started': time.strftime("%Y-%m-%d %H:%M:%S")}
+    try:
+        report['before'] = file_stats(conn)
+        report['queries_before'] = query_stats(conn)
+
+        report['removed'] = apply_retention(conn, retention_days, archive_dir)
+
+        # auto_vacuum can only be changed by a full VACUUM; do that once, then go incremental
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            report['vacuum'] = "full (switched to incremental)"
+        else:
+            # execute() stops after the first step, which frees a single page;
+            # executescript runs the pragma to completion
+            conn.executescript(f"PRAGMA incremental_vacuum({int(vacuum_pages)})")
+            report['vacuum'] = f"incremental ({vacuum_pages} pages max)"
+
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone() is None:
+            conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+
+        if conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            report['checkpoint'] = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+
+        report['after'] = file_stats(conn)
+        report['queries_after'] = query_stats(conn)
+    finally:
+        db.close()
+    return report
+
+
+def print_report(report: dict):
+    before, after = report['before'], report['after']
+    print(f"Maintenance at {report['started']}:")
+    print(f"  removed: {report['removed']['orders']} old orders, {report['removed']['items']} deleted items, "
+          f"{report['removed']['changes']} synced change-log rows")
+    print(f"  vacuum: {report['vacuum']}")
+    print(f"  file size: {before['size_bytes'] / 1024:.0f} KiB -> {after['size_bytes'] / 1024:.0f} KiB "
+          f"(free pages {before['free_pages']} -> {after['free_pages']})")
+    for name, (plan, micros) in report['queries_after'].items():
+        old_plan, old_micros = report['queries_before'][name]
+        print(f"  {name}: {old_micros:.1f} us -> {micros:.1f} us  [{plan}]")
+        if plan != old_plan:
+            print(f"    plan was [{old_plan}]")
+
+
+class MaintenanceScheduler:
+    # Runs run_maintenance on a background thread once the register has been idle.
+    # activity is anything with a last_activity attribute holding a time.monotonic()
+    # value, normally the register's TakeOrder.
+
+    def __init__(self, db_name: str, activity, idle_seconds: float = 300.0,
+                 min_interval: float = 6 * 3600.0, check_every: float = 30.0,
+                 retention_days: int | None = None, vacuum_pages: int = 1000,
+                 archive_dir: str = "archive"):
+
+        self.db_name = db_name
+        self.activity = activity
+        self.idle_seconds = idle_seconds
+        self.min_interval = min_interval
+        self.check_every = check_every
+        self.retention_days = retention_days
+        self.vacuum_pages = vacuum_pages
+        self.archive_dir = archive_dir
+        self.last_run = None          # time.monotonic() of the last pass
+        self.last_report = None
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def is_idle(self) -> bool:
+        return time.monotonic() - self.activity.last_activity >= self.idle_seconds
+
+    def due(self) -> bool:
+        return self.last_run is None or time.monotonic() - self.last_run >= self.min_interval
+
+    def run_now(self) -> dict:
+        self.last_report = run_maintenance(self.db_name, self.retention_days, self.vacuum_pages,
+                                           self.archive_dir)
+        self.last_run = time.monotonic()
+        print_report(self.last_report)
+        return self.last_report
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.check_every):
+            if self.due() and self.is_idle():
+                try:
+                    self.run_now()
+                except sqlite3.Error as e:
+                    # most likely the register got busy again; try on the next idle stretch
+                    print(f"Maintenance skipped: {e}")
+                    self.last_run = time.monotonic() - self.min_interval + self.idle_seconds
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Vacuum, analyze, checkpoint and prune the register database")
+    parser.add_argument("--db", default="restaurant.db")
+    parser.add_argument("--retention-days", type=int, help="delete paid/voided orders older than this")
+    parser.add_argument("--vacuum-pages", type=int, default=1000)
+    parser.add_argument("--archive-dir", default="archive", help="items used by archived days are kept")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} does not exist")
+    print_report(run_maintenance(args.db, args.retention_days, args.vacuum_pages, args.archive_dir))
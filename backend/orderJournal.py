@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import threading
+from items import Item
+from order import Order
+
+
+class OrderJournal:
+    # Append-only log of every change TakeOrder makes to its orders, one JSON event per line.
+    # Each event is flushed to the OS straight away, so a crashed register loses nothing;
+    # fsync (needed to survive a power cut) is batched: a background thread syncs at most
+    # once every sync_interval seconds, and checkout syncs before it returns.
+    # After a checkout or cancel the log is compacted down to the orders still open.
+
+    def __init__(self, path: str, sync_interval: float = 0.05):
+
+        self.path = path
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._closed = False
+        self._file = open(path, "a", encoding="utf-8")
+
+        self._syncer = threading.Thread(target=self._sync_loop, daemon=True)
+        self._syncer.start()
+
+    def record(self, op: str, order_id, **data):
+        # Appends one event
+        event = {"op": op, "order_id": order_id, **data}
+        line = json.dumps(event, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._dirty = True
+
+    def record_item(self, order_id, item: Item, quantity: int):
+        self.record("add", order_id, item=[item.itemID, item.name, item.description, item.price],
+                    qty=quantity)
+
+    def sync(self):
+        # Forces everything written so far onto disk
+        with self._lock:
+            if self._dirty and not self._closed:
+                os.fsync(self._file.fileno())
+                self._dirty = False
+
+    def _sync_loop(self):
+        while not self._closed:
+            time.sleep(self.sync_interval)
+            self.sync()
+
+    def replay(self) -> tuple:
+        # Rebuilds the orders that were still open: returns (current order ID, {order_id: Order})
+        orders = {}
+        current_id = None
+        if not os.path.exists(self.path):
+            return current_id, orders
+
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break  # torn last line from the crash, everything before it is good
+
+                op = event["op"]
+                order_id = event["order_id"]
+                if op == "start":
+                    orders[order_id] = Order(order_id, event.get("name", ""))
+                    current_id = order_id
+                elif order_id not in orders:
+                    continue
+                elif op == "add":
+                    item_id, name, description, price = event["item"]
+                    orders[order_id].add_item(Item(item_id, name, description, price), event["qty"])
+                elif op == "remove":
+                    orders[order_id].remove_item(event["item_id"])
+                elif op == "hold":
+                    if current_id == order_id:
+                        current_id = None
+                elif op == "switch":
+                    current_id = order_id
+                elif op in ("checkout", "cancel"):
+                    del orders[order_id]
+                    if current_id == order_id:
+                        current_id = None
+
+        return current_id, orders
+
+    def compact(self, current_order, open_orders: dict):
+        # Rewrites the log with just enough events to rebuild the orders still open
+        lines = []
+        for order in list(open_orders.values()) + ([current_order] if current_order else []):
+            lines.append(json.dumps({"op": "start", "order_id": order.orderID, "name": order.name},
+                                    separators=(",", ":")))
+            for item, quantity in order.item_list:
+                lines.append(json.dumps({"op": "add", "order_id": order.orderID,
+                                         "item": [item.itemID, item.name, item.description, item.price],
+                                         "qty": quantity}, separators=(",", ":")))
+            if order is not current_order:
+                lines.append(json.dumps({"op": "hold", "order_id": order.orderID},
+                                        separators=(",", ":")))
+
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("".join(line + "\n" for line in lines))
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            self._dirty = False
+
+    def close(self):
+        self.sync()
+        with self._lock:
+            self._closed = True
+            self._file.close()
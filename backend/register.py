@@ -0,0 +1,174 @@
+from typing import Optional
+from database import POSDatabase
+from takeOrder import TakeOrder
+from itemLookup import ItemLookup
+from orderJournal import OrderJournal
+from items import Item
+from order import Order
+
+
+class Register:
+    # The whole order flow of one register without any GUI: order IDs, item lookup,
+    # custom items, checkout and persistence. gui.py drives one of these, and so can
+    # a scanner daemon, a kiosk or the script replay at the bottom of this file.
+    # Errors are raised as ValueError like TakeOrder does.
+
+    def __init__(self, db_name: str = "restaurant.db", terminal_id: Optional[str] = None,
+                 database: Optional[POSDatabase] = None, journal_path: Optional[str] = None):
+
+        self.db = database if database is not None else POSDatabase(db_name)
+        self.journal = OrderJournal(journal_path) if journal_path else None
+        self.take_order = TakeOrder(self.db, terminal_id, self.journal)
+        self.lookup = ItemLookup(self.db)
+
+    @property
+    def current_order(self) -> Optional[Order]:
+        return self.take_order.current_order
+
+    def next_order_id(self) -> int:
+        # ID the next order will most likely get (another terminal may take it first)
+        return self.db.get_next_order_id()
+
+    def resume(self) -> Optional[Order]:
+        # Rebuilds open orders from the journal, then loads any other open tabs
+        # from the database, and makes the most recent one current
+        self.take_order.recover()
+        open_ids = self.take_order.resume_open_orders()
+        if open_ids and self.take_order.current_order is None:
+            self.take_order.switch_order(max(open_ids))
+        return self.take_order.current_order
+
+    def start_order(self, customer_name: str, order_id: Optional[int] = None) -> Order:
+        # Opens a new order, the database picks the ID unless one is requested
+        if not customer_name:
+            raise ValueError("Please enter customer name")
+        self.take_order.start_new_order(order_id, customer_name)
+        return self.take_order.current_order
+
+    def find_item(self, item_id: int) -> Optional[Item]:
+        return self.lookup.lookup(item_id)
+
+    def add_item(self, item_id: int, quantity: int = 1, name: Optional[str] = None,
+                 description: str = "", price: Optional[float] = None) -> tuple:
+        # Adds an item to the current order and returns (item, saved) where saved
+        # is True when the item was new and got added to the menu.
+        # ID 0 is a custom item and gets its own negative ID; unknown IDs need a name and price.
+        if self.take_order.current_order is None:
+            raise ValueError("No active order. Start a new order first.")
+        if quantity <= 0:
+            raise ValueError("Quantity must be greater than 0.")
+
+        item = None if item_id == 0 else self.lookup.lookup(item_id)
+        saved = False
+        if item is None:
+            # Only IDs that aren't on the menu at all may be entered by hand; an existing
+            # item that is out of stock or removed must not be sold under a typed price
+            if item_id != 0 and self.db.item_exists(item_id):
+                raise ValueError(f"Item ID {item_id} is out of stock or no longer available")
+            if not name or price is None:
+                raise ValueError(f"Item ID {item_id} not found - enter a name and price")
+            if item_id == 0:
+                item_id = self.db.next_custom_item_id()
+            item = Item(item_id, name, description, price)
+            saved = self.db.add_item(item)
+            if saved:
+                self.lookup.remember(item)
+
+        self.take_order.add_item_to_order(item, quantity)
+        return item, saved
+
+    def remove_item(self, item_id: int):
+        self.take_order.remove_item_from_order(item_id)
+
+    def checkout(self) -> tuple:
+        # Pays the current order, returns (order_id, total)
+        if self.take_order.current_order is None:
+            raise ValueError("No active order to checkout.")
+        order_id = self.take_order.current_order.orderID
+        total = self.take_order.checkout_order()
+        return order_id, total
+
+    def cancel_order(self):
+        self.take_order.cancel_order()
+
+    def close(self):
+        if self.journal:
+            self.journal.close()
+        self.db.close()
+
+
+def run_script(register: Register, lines) -> dict:
+    # Replays a script of register commands, one per line:
+    #   start <customer name>
+    #   add <item_id> [quantity] [name] [description] [price]
+    #   remove <item_id>
+    #   checkout | cancel
+    # Blank lines and lines starting with # are skipped. Returns counts of what happened.
+    import shlex
+
+    stats = {"orders": 0, "items": 0, "cancelled": 0, "errors": 0, "revenue": 0.0}
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            command, *args = shlex.split(line)
+            if command == "start":
+                if register.current_order is not None:
+                    register.cancel_order()
+                    stats["cancelled"] += 1
+                register.start_order(" ".join(args))
+            elif command == "add":
+                quantity = int(args[1]) if len(args) > 1 else 1
+                name = args[2] if len(args) > 2 else None
+                description = args[3] if len(args) > 3 else ""
+                price = float(args[4]) if len(args) > 4 else None
+                register.add_item(int(args[0]), quantity, name, description, price)
+                stats["items"] += 1
+            elif command == "remove":
+                register.remove_item(int(args[0]))
+            elif command == "checkout":
+                _, total = register.checkout()
+                stats["orders"] += 1
+                stats["revenue"] += total
+            elif command == "cancel":
+                register.cancel_order()
+                stats["cancelled"] += 1
+            else:
+                raise ValueError(f"Unknown command '{command}'")
+        except (ValueError, IndexError) as e:
+            stats["errors"] += 1
+            print(f"Line {number}: {e}")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Replay a script of orders through the register engine")
+    parser.add_argument("script", help="file of register commands (see run_script)")
+    parser.add_argument("--db", default="restaurant.db", help="database file, or :memory: for load tests")
+    parser.add_argument("--terminal", default="replay")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the script this many times")
+    parser.add_argument("--journal", help="also log every change to this journal file")
+    args = parser.parse_args()
+
+    with open(args.script, encoding="utf-8") as f:
+        script = f.readlines()
+
+    register = Register(args.db, args.terminal, journal_path=args.journal)
+    started = time.perf_counter()
+    totals = {}
+    try:
+        for _ in range(args.repeat):
+            for key, value in run_script(register, script).items():
+                totals[key] = totals.get(key, 0) + value
+    finally:
+        register.close()
+    elapsed = time.perf_counter() - started
+
+    print(f"{totals['orders']} orders ({totals['items']} items, {totals['cancelled']} cancelled, "
+          f"{totals['errors']} errors) totalling ${totals['revenue']:.2f} in {elapsed:.2f}s")
+    if elapsed > 0:
+        print(f"{totals['orders'] / elapsed:.0f} orders/s")
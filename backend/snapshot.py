@@ -0,0 +1,111 @@
+import os
+import time
+import sqlite3
+import threading
+
+# Read-only reporting snapshots of the register database.
+# The copy is made with SQLite's online backup API a few pages at a time, with a short
+# pause between steps, so the register can keep writing while a snapshot is taken.
+# Reports then run against the snapshot file (see POSDatabase.export_end_of_day_csv's
+# `source`) and never hold read locks on the live database during a checkout.
+
+SNAPSHOT_PATH = "restaurant_snapshot.db"
+
+
+def refresh_snapshot(db_name: str, snapshot_path: str = SNAPSHOT_PATH,
+                     pages: int = 256, pause: float = 0.005) -> float:
+    #Copies db_name into snapshot_path, `pages` pages per step. Readers that already have
+    #the old snapshot open keep a consistent view; the new one is swapped in atomically.
+    #Returns how long the copy took in seconds.
+    started = time.perf_counter()
+    tmp_path = snapshot_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    src = sqlite3.connect(f"file:{db_name}?mode=ro", uri=True)
+    dst = sqlite3.connect(tmp_path)
+    try:
+        # If another connection writes during the copy SQLite restarts it, so the
+        # finished snapshot is always a consistent point in time
+        src.backup(dst, pages=pages, sleep=pause)
+    finally:
+        dst.close()
+        src.close()
+
+    os.replace(tmp_path, snapshot_path)
+    return time.perf_counter() - started
+
+
+class SnapshotScheduler:
+    # Refreshes a reporting snapshot in the background every `interval` seconds
+
+    def __init__(self, db_name: str, snapshot_path: str = SNAPSHOT_PATH,
+                 interval: float = 300.0, pages: int = 256):
+
+        self.db_name = db_name
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.pages = pages
+        self.last_refresh = None      # time.time() of the last finished snapshot
+        self.last_duration = None
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh_now(self) -> str:
+        #Takes a snapshot right away and returns its path
+        with self._lock:
+            self.last_duration = refresh_snapshot(self.db_name, self.snapshot_path, self.pages)
+            self.last_refresh = time.time()
+        return self.snapshot_path
+
+    def ensure_fresh(self, max_age: float | None = None) -> str:
+        #Returns the snapshot path, refreshing first if it's older than max_age (default: interval)
+        max_age = self.interval if max_age is None else max_age
+        if self.last_refresh is None or time.time() - self.last_refresh > max_age:
+            self.refresh_now()
+        return self.snapshot_path
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh_now()
+            except sqlite3.Error as e:
+                print(f"Error refreshing snapshot: {e}")
+            self._stop.wait(self.interval)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Take a reporting snapshot of the register database")
+    parser.add_argument("--db", default="restaurant.db")
+    parser.add_argument("--out", default=SNAPSHOT_PATH)
+    parser.add_argument("--pages", type=int, default=256, help="pages copied per backup step")
+    parser.add_argument("--every", type=float, help="keep refreshing every N seconds")
+    args = parser.parse_args()
+
+    if args.every:
+        scheduler = SnapshotScheduler(args.db, args.out, args.every, args.pages)
+        scheduler.start()
+        try:
+            while True:
+                time.sleep(args.every)
+                print(f"Snapshot refreshed in {scheduler.last_duration:.3f}s")
+        except KeyboardInterrupt:
+            scheduler.stop()
+    else:
+        duration = refresh_snapshot(args.db, args.out, args.pages)
+        print(f"Snapshot written to {args.out} in {duration:.3f}s")
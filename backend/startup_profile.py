@@ -0,0 +1,57 @@
+import sys
+import time
+
+# Time-to-first-order tracking for the register.
+# gui.py calls mark() at each startup phase; report() prints the breakdown.
+# Running this file directly also prints a "-X importtime" breakdown of gui.py's imports.
+
+_START = time.perf_counter()
+_marks = []
+
+
+def mark(label: str):
+    #Records how long after startup began a phase finished
+    _marks.append((label, time.perf_counter() - _START))
+
+
+def report():
+    #Prints each phase with its own duration and the running total
+    print("Startup timing:")
+    previous = 0.0
+    for label, elapsed in _marks:
+        print(f"  {label:<28} +{(elapsed - previous) * 1000:8.1f} ms  {elapsed * 1000:8.1f} ms")
+        previous = elapsed
+
+
+def import_breakdown(module: str = "gui", top: int = 15) -> list:
+    #Imports the module in a fresh interpreter with -X importtime and returns
+    #(cumulative_us, self_us, name) for the slowest imports
+    import subprocess  # only needed here, keep it off the gui startup path
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        # format is "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0])
+            cumulative_us = int(parts[1])
+        except ValueError:
+            continue
+        rows.append((cumulative_us, self_us, parts[2].rstrip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+if __name__ == "__main__":
+    module = sys.argv[1] if len(sys.argv) > 1 else "gui"
+    print(f"Slowest imports for '{module}' (microseconds):")
+    print(f"  {'cumulative':>10}  {'self':>8}  module")
+    for cumulative_us, self_us, name in import_breakdown(module):
+        print(f"  {cumulative_us:>10}  {self_us:>8}  {name}")
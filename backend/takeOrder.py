@@ -1,50 +1,92 @@
 from order import Order
 from items import Item
 from orderCheckout import OrderCheckout
+import time
 from typing import Optional
 
 
 class TakeOrder:
     # this manages the process of taking, modifying, and checking out customer orders
 
-    def __init__(self, database=None):
+    def __init__(self, database=None, terminal_id: Optional[str] = None, journal=None):
+
+        # When a database is given every order is persisted as an open tab and
+        # each change is written as it happens, so nothing is lost on a crash
+        self.database = database
+        self.terminal_id = terminal_id
+
+        # optional OrderJournal; every change is logged so recover() can rebuild open orders
+        self.journal = journal
 
         # Stores the current active order, none if no order has started
         self.current_order = None
 
+        # open tabs that are on hold, by order ID
+        self.open_orders = {}
+
         # stores previously completed orders
         self.order_history = []
 
+        # time.monotonic() of the last change, so housekeeping can wait for a quiet spell
+        self.last_activity = time.monotonic()
+
     def start_new_order(self, order_id: int, customer_name: str = ""):
 
         #Creates a new order using the Order class
+        self.last_activity = time.monotonic()
         if self.current_order is not None:
             raise ValueError("An order is already in progress. Please checkout or cancel the current order first.")
+
+        if self.database:
+            order_id = self.database.open_order(customer_name, self.terminal_id, order_id)
+            if order_id is None:
+                raise ValueError("Could not save the new order.")
         
         self.current_order = Order(order_id, customer_name)
 
+        if self.journal:
+            self.journal.record("start", order_id, name=customer_name)
+
     def add_item_to_order(self, item: Item, quantity: int = 1):
 
         #Adds an item to the current order
+        self.last_activity = time.monotonic()
         if self.current_order is None:
             raise ValueError("No active order. Start a new order first.")
         
         if quantity <= 0:
             raise ValueError("Quantity must be greater than 0.")
         
+        if self.database:
+            if not self.database.add_order_line(self.current_order.orderID, item, quantity):
+                raise ValueError(f"Could not add item {item.itemID} to order {self.current_order.orderID}.")
+
         self.current_order.add_item(item, quantity)
 
+        if self.journal:
+            self.journal.record_item(self.current_order.orderID, item, quantity)
+
     def remove_item_from_order(self, item_id: int):
 
         #Removes an item from the current order by item ID
+        self.last_activity = time.monotonic()
         if self.current_order is None:
             raise ValueError("No active order. Start a new order first.")
+
+        # Removing an item that isn't on the order changes nothing, so only check real removals
+        if self.database and item_id in self.current_order.items_dict:
+            if not self.database.remove_order_line(self.current_order.orderID, item_id):
+                raise ValueError(f"Could not remove item {item_id} from order {self.current_order.orderID}.")
         
         self.current_order.remove_item(item_id)
 
+        if self.journal:
+            self.journal.record("remove", self.current_order.orderID, item_id=item_id)
+
     def checkout_order(self) -> float:
         
         # Uses OrderCheckout to calculate the total and finishes the order.
+        self.last_activity = time.monotonic()
         
         if self.current_order is None:
             raise ValueError("No active order to checkout.")
@@ -56,33 +98,121 @@ class TakeOrder:
         checkout = OrderCheckout(self.current_order)
         total = checkout.calculate_total()
         
-        # Saves to database if available
+        # The lines are already saved, so checkout only marks the order paid
         if self.database:
-            db_order_id = self.database.save_order(self.current_order, total)
-            if db_order_id:
-                print(f"Order saved to database with ID: {db_order_id}")
+            if not self.database.pay_order(self.current_order.orderID, total):
+                raise ValueError(f"Order {self.current_order.orderID} could not be marked as paid.")
         
         # Saves order to history
         self.order_history.append(self.current_order)
+
+        if self.journal:
+            self.journal.record("checkout", self.current_order.orderID)
         
         # Resets current order
         self.current_order = None
+
+        if self.journal:
+            self.journal.compact(None, self.open_orders)
         
         return total
 
     def cancel_order(self):
         # Cancels the current order and resets it
+        self.last_activity = time.monotonic()
         if self.current_order is None:
             raise ValueError("No active order to cancel.")
         
+        if self.database:
+            if not self.database.void_order(self.current_order.orderID):
+                raise ValueError(f"Order {self.current_order.orderID} could not be cancelled.")
+
+        if self.journal:
+            self.journal.record("cancel", self.current_order.orderID)
+
+        self.current_order = None
+
+        if self.journal:
+            self.journal.compact(None, self.open_orders)
+
+    def send_order(self):
+        # Marks the current order as sent to the kitchen, it stays editable
+        self.last_activity = time.monotonic()
+        if self.current_order is None:
+            raise ValueError("No active order to send.")
+
+        if self.database:
+            if not self.database.set_order_status(self.current_order.orderID, "sent"):
+                raise ValueError(f"Order {self.current_order.orderID} could not be sent to the kitchen.")
+
+    def hold_order(self):
+        # Parks the current order as an open tab so another one can be started
+        self.last_activity = time.monotonic()
+        if self.current_order is None:
+            raise ValueError("No active order to hold.")
+
+        self.open_orders[self.current_order.orderID] = self.current_order
+        if self.journal:
+            self.journal.record("hold", self.current_order.orderID)
         self.current_order = None
 
+    def switch_order(self, order_id: int):
+        # Makes an open tab the current order, holding whatever was current
+        self.last_activity = time.monotonic()
+        if order_id not in self.open_orders:
+            raise ValueError(f"No open order with ID {order_id}.")
+
+        if self.current_order is not None:
+            self.hold_order()
+        self.current_order = self.open_orders.pop(order_id)
+        if self.journal:
+            self.journal.record("switch", order_id)
+
+    def recover(self) -> Optional[Order]:
+        # Rebuilds the open orders from the journal after a crash, returns the current one
+        if not self.journal:
+            return None
+
+        current_id, orders = self.journal.replay()
+
+        # The database is the record of what was paid or voided before the crash
+        if self.database:
+            still_open = {row['order_id'] for row in self.database.get_open_orders(self.terminal_id)}
+            orders = {order_id: order for order_id, order in orders.items() if order_id in still_open}
+
+        if current_id in orders and self.current_order is None:
+            self.current_order = orders.pop(current_id)
+        for order_id, order in orders.items():
+            if self.current_order is None or order_id != self.current_order.orderID:
+                self.open_orders.setdefault(order_id, order)
+
+        # Start the log over from what was recovered; this also drops a torn last line,
+        # which new events would otherwise be appended onto
+        self.journal.compact(self.current_order, self.open_orders)
+        return self.current_order
+
+    def resume_open_orders(self) -> list:
+        # Loads this terminal's open tabs from the database, returns their IDs
+        if not self.database:
+            return []
+
+        current_id = self.current_order.orderID if self.current_order else None
+        for row in self.database.get_open_orders(self.terminal_id):
+            order_id = row['order_id']
+            if order_id != current_id and order_id not in self.open_orders:
+                order = self.database.load_order(order_id)
+                if order is not None:
+                    self.open_orders[order_id] = order
+        return list(self.open_orders)
+
     def get_current_order(self) -> Optional[Order]:
         # Returns the current active order
         return self.current_order
     
+    def get_open_orders(self) -> list:
+        # Returns the open tabs that are on hold
+        return list(self.open_orders.values())
+
     def get_order_history(self) -> list:
        # Returns the list of all completed orders
         return self.order_history
-    
-    
\ No newline at end of file